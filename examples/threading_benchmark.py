@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+from visdata.binned_data import BinAxis, BinnedCounts2d, Profile2dAccumulator
+
+
+def best_time(func, repeat=3):
+    """Return the best runtime of 'func' in seconds."""
+    times = []
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t_start)
+
+    return min(times)
+
+
+def benchmark_fill(n=2**24, max_threads=None):
+    """Print the fill times for 1 to 'max_threads' threads and the speedup against 1 thread."""
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=n)
+    y = x + rng.normal(size=n)
+    x_axis = BinAxis(np.linspace(-5, 5, 501))
+    y_axis = BinAxis(np.linspace(-7, 7, 501))
+    if max_threads is None:
+        max_threads = os.process_cpu_count()
+
+    fills = {
+        "BinnedCounts2d.fill": lambda n_threads: BinnedCounts2d(x_axis, y_axis).fill(
+            x, y, n_threads=n_threads
+        ),
+        "Profile2dAccumulator.fill": lambda n_threads: Profile2dAccumulator(
+            x_axis.edges, quantile_accuracy=0.01
+        ).fill(x, y, n_threads=n_threads),
+    }
+    print(f"{n} entries, {os.process_cpu_count()} CPUs")
+    for name, fill in fills.items():
+        baseline = best_time(lambda: fill(1))
+        for n_threads in range(1, max_threads + 1):
+            runtime = baseline if n_threads == 1 else best_time(lambda: fill(n_threads))
+            print(
+                f"{name:<26} n_threads={n_threads:<3} {runtime:>8.3f} s "
+                f"speedup {baseline / runtime:>5.2f}"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_fill(max_threads=int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -1,4 +1,4 @@
 from .__util import get_module, get_numpy
-from .binned_data import Histogram2d, Profile2d, Profile2dPlotConfig, Profile2dPlotConfigMean, Profile2dPlotConfigMedian
+from .binned_data import BinAxis, Histogram2d, Profile2d, Profile2dPlotConfig, Profile2dPlotConfigMean, Profile2dPlotConfigMedian, Profile2dPlotConfigBand, Profile2dAccumulator, MultiProfile2d, Profile3d, HistogramNd, BinnedProfile2d
 from .output import Table, object_vars_str
 from .plotting import Measurement, MeasurementResultPlotConfig, MeasurementResult, CompareMeasurementsPlot
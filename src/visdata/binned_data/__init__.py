@@ -1,2 +1,12 @@
-from .binning import logbins, bin_centers, which_bin
-from .histogram2d import Histogram2d, Profile2d, Profile2dPlotConfig, Profile2dPlotConfigMean, Profile2dPlotConfigMedian, add_profile2d_to_axis
\ No newline at end of file
+from .binning import BinAxis, logbins, bin_centers, which_bin, bin_indices, edges_spacing, resolve_bin_edges
+from .binned_profile import BinnedProfile2d
+from .counts import BinnedCounts1d, BinnedCounts2d
+from .histogram2d import Histogram2d, Profile2d, Profile2dPlotConfig, Profile2dPlotConfigMean, Profile2dPlotConfigMedian, Profile2dPlotConfigBand, add_profile2d_to_axis
+from .histogramnd import HistogramNd
+from .multi_profile import MultiProfile2d
+from .profile3d import Profile3d
+from .streaming import Profile2dAccumulator
+from .out_of_core import load_columns
+from .pyramid import CountsPyramid
+from .parallel import parallel_profile2d
+from .segments import BinnedData
@@ -0,0 +1,114 @@
+import numpy as np
+
+from .binning import BinAxis
+from .histogram2d import (
+    Profile2dPlotConfig,
+    Profile2dPlotConfigMean,
+    Profile2dPlotConfigMedian,
+    add_profile2d_configs_to_axis,
+)
+from .storage import load_arrays
+
+
+class BinnedProfile2d:
+
+    def __init__(self, bin_edges, counts, statistics, effective_counts=None, groups=None):
+        """Profile from already calculated statistics, e.g. loaded from a file.
+
+        'statistics' maps quantity names (e.g. 'mean' or 'median') to their
+        values for each x bin, with 'groups' for each group and x bin.
+        """
+        if isinstance(bin_edges, BinAxis):
+            self.__axis = bin_edges
+        else:
+            self.__axis = BinAxis(bin_edges)
+        self.__counts = counts
+        self.__effective_counts = counts if effective_counts is None else effective_counts
+        self.__statistics = dict(statistics)
+        self.__groups = groups
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load a profile saved by 'Profile2d.save' (memory-mapped with 'mmap_mode')."""
+        arrays = load_arrays(path, "Profile2d", mmap_mode=mmap_mode)
+        statistics = {
+            name.removeprefix("statistic_"): values
+            for name, values in arrays.items()
+            if name.startswith("statistic_")
+        }
+
+        return cls(
+            arrays["edges"],
+            arrays["counts"],
+            statistics,
+            effective_counts=arrays["effective_counts"],
+            groups=arrays.get("groups"),
+        )
+
+    @property
+    def bin_axis(self):
+        """Return the axis of the x bins."""
+        return self.__axis
+
+    @property
+    def bin_centers(self):
+        """Return the centers for the x bins."""
+        return self.__axis.centers
+
+    @property
+    def bin_edges(self):
+        """Return the edges for the x bins."""
+        return self.__axis.edges
+
+    @property
+    def groups(self):
+        """Return the group labels (None without groups)."""
+        return self.__groups
+
+    @property
+    def bin_counts(self):
+        """Return the number of entries for each x bin."""
+        return self.__counts
+
+    @property
+    def bin_effective_counts(self):
+        """Return the effective number of entries for each x bin."""
+        return self.__effective_counts
+
+    @property
+    def quantities(self):
+        """Return the names of the available statistics."""
+        return list(self.__statistics)
+
+    def statistic(self, name, *args):
+        """Return the stored statistic 'name' for each x bin (None if not available)."""
+        if args:
+            return None
+
+        return self.__statistics.get(name)
+
+    def add_to_axis(self, ax, *configs: Profile2dPlotConfig, group=None):
+        """Add the profile to the given axis, see 'Profile2d.add_to_axis'."""
+        if not len(configs):
+            configs = tuple(
+                config
+                for config in (Profile2dPlotConfigMedian(), Profile2dPlotConfigMean())
+                if config.quantity in self.__statistics
+            )
+
+        if self.__groups is None:
+            if group is not None:
+                raise ValueError(f"Can't select group '{group}', the profile has no groups!")
+            statistic = self.statistic
+        elif group is None:
+            raise ValueError("Select a group to draw a grouped profile!")
+        else:
+            matches = np.flatnonzero(self.__groups == group)
+            if not matches.size:
+                raise ValueError(f"Unknown group '{group}'!")
+
+            def statistic(quantity, *args):
+                values = self.statistic(quantity, *args)
+                return None if values is None else values[matches[0]]
+
+        add_profile2d_configs_to_axis(ax, self.bin_centers, statistic, *configs)
@@ -1,3 +1,5 @@
+from functools import cached_property
+
 import numpy as np
 
 
@@ -13,23 +15,247 @@ def logbins(values, n_bins, log_func=None):
 
 def bin_centers(bin_edges):
     """Return bin centers for given bin edges supporting unequal bins."""
-    bin_centers = [
-        (bin_edges[idx] + bin_edges[idx + 1]) / 2 for idx in range(len(bin_edges) - 1)
-    ]
+    if isinstance(bin_edges, BinAxis):
+        return bin_edges.centers
+
+    bin_edges = np.asarray(bin_edges)
+
+    return (bin_edges[:-1] + bin_edges[1:]) / 2
+
+
+def edges_spacing(bin_edges):
+    """Return the spacing of the bin edges: 'uniform', 'log' or 'variable'."""
+    bin_edges = np.asarray(bin_edges, dtype=np.float64)
+    widths = np.diff(bin_edges)
+    if np.allclose(widths, widths[0], rtol=1e-9, atol=0):
+        return "uniform"
+
+    if bin_edges[0] > 0:
+        ratios = bin_edges[1:] / bin_edges[:-1]
+        if np.allclose(ratios, ratios[0], rtol=1e-9, atol=0):
+            return "log"
+
+    return "variable"
+
+
+def bin_indices(data, bin_edges, spacing=None):
+    """Return the bin index for each value (-1 if out of range or nan).
+
+    The bins are half-open except for the righthand-most bin which is closed.
+    Uniform and logarithmic bins are found arithmetically in O(1), variable
+    bins by binary search. The 'spacing' is detected if not given.
+    """
+    data = np.asarray(data)
+    if data.ndim == 0:
+        # Index assignments below need an array
+        return bin_indices(data.reshape(1), bin_edges, spacing).reshape(())
+    bin_edges = np.asarray(bin_edges)
+    n_bins = bin_edges.size - 1
+    if spacing is None:
+        spacing = edges_spacing(bin_edges)
+
+    if spacing == "variable":
+        indices = np.searchsorted(bin_edges, data, side="right") - 1
+        indices[data == bin_edges[-1]] = n_bins - 1
+        indices[(indices < 0) | (indices >= n_bins)] = -1
+        return indices
+
+    in_range = (data >= bin_edges[0]) & (data <= bin_edges[-1])
+    values = data[in_range]
+    low, high = bin_edges[0], bin_edges[-1]
+    if spacing == "log":
+        values, low, high = np.log(values), np.log(low), np.log(high)
+    elif spacing != "uniform":
+        raise ValueError(f"Unknown spacing '{spacing}'!")
+
+    positions = ((values - low) * (n_bins / (high - low))).astype(np.intp)
+    np.clip(positions, 0, n_bins - 1, out=positions)
+    # Correct rounding errors by comparing with the actual edges
+    values = data[in_range]
+    positions -= values < bin_edges[positions]
+    positions += (positions < n_bins - 1) & (values >= bin_edges[positions + 1])
+
+    indices = np.full(data.shape, -1, dtype=np.intp)
+    indices[in_range] = positions
 
-    return bin_centers
+    return indices
 
 
 def which_bin(data, bin_edges):
-    """Select bin id for given data."""
-    bin_id = None
-    for idx in range(len(bin_edges) - 1):
-        if data >= bin_edges[idx]:
-            bin_id = idx
-        else:
-            break
-
-    if bin_id is None:
-        raise ValueError(f"DATA OUT OF RANGE! {data} not in {bin_edges}!")
-
-    return bin_id
+    """Select bin id for given data (scalar or array).
+
+    Out of range values are masked, the righthand-most bin is closed.
+    """
+    indices = np.ma.masked_less(bin_indices(data, bin_edges), 0)
+
+    return indices if np.ndim(data) else indices[()]
+
+
+def resolve_bin_edges(data, bins):
+    """Return the bin edges for the data like 'np.histogram_bin_edges'.
+
+    Explicit edges are passed through, otherwise only the range of the data
+    is scanned. To bin the same data repeatedly pass a BinAxis instead, e.g.
+    'BinAxis.from_data(x, 10)', which skips the scan.
+    """
+    if np.ndim(bins) == 1:
+        return np.asarray(bins)
+
+    return np.histogram_bin_edges(data, bins)
+
+
+def xy_bins(bins):
+    """Return the x and y binning of 'np.histogram2d' style bins."""
+    try:
+        n_bins = len(bins)
+    except TypeError:
+        return bins, bins
+
+    # A pair is [x binning, y binning], otherwise it's the same for x and y
+    return (bins[0], bins[1]) if n_bins == 2 else (bins, bins)
+
+
+class BinAxis:
+
+    def __init__(self, edges, spacing=None):
+        """Bin axis with fixed edges and uniform, log or variable spacing.
+
+        Centers, widths and the spacing are computed once when needed, the
+        spacing selects the fastest index lookup. The spacing is detected if
+        not given. Share one axis between profiles and histograms to avoid
+        rebuilding it.
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        if edges.flags.writeable or not edges.flags.owndata:
+            # Keep a private copy unless the edges are already frozen
+            edges = edges.copy()
+        if edges.ndim != 1 or edges.size < 2:
+            raise ValueError("Bin edges must be a 1d array with at least two entries!")
+        if np.any(np.diff(edges) <= 0):
+            raise ValueError("Bin edges must increase monotonically!")
+        edges.flags.writeable = False
+        self.__edges = edges
+
+        if spacing is not None:
+            self.__dict__["spacing"] = spacing
+
+    @classmethod
+    def uniform(cls, n_bins, start, stop):
+        """Create an axis with 'n_bins' bins of equal width."""
+        return cls(np.linspace(start, stop, n_bins + 1), spacing="uniform")
+
+    @classmethod
+    def log(cls, n_bins, start, stop):
+        """Create an axis with 'n_bins' logarithmic bins."""
+        return cls(
+            np.logspace(np.log10(start), np.log10(stop), n_bins + 1), spacing="log"
+        )
+
+    @classmethod
+    def from_data(cls, data, bins):
+        """Create an axis for the data like 'np.histogram_bin_edges'.
+
+        An axis given as 'bins' is returned as it is.
+        """
+        if isinstance(bins, cls):
+            return bins
+
+        return cls(resolve_bin_edges(data, bins))
+
+    def __array__(self, dtype=None, copy=None):
+        """Return the edges when used as an array, e.g. by numpy."""
+        if copy:
+            return np.array(self.__edges, dtype=dtype)
+
+        return np.asarray(self.__edges, dtype=dtype)
+
+    def __eq__(self, other):
+        if not isinstance(other, BinAxis):
+            return NotImplemented
+
+        return np.array_equal(self.__edges, other.__edges)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({self.n_bins} {self.spacing} bins from "
+            f"{self.__edges[0]} to {self.__edges[-1]})"
+        )
+
+    @property
+    def edges(self):
+        """Return the bin edges (read-only)."""
+        return self.__edges
+
+    @property
+    def n_bins(self):
+        """Return the number of bins."""
+        return self.__edges.size - 1
+
+    @cached_property
+    def spacing(self):
+        """Return the spacing of the bins: 'uniform', 'log' or 'variable'."""
+        return edges_spacing(self.__edges)
+
+    @cached_property
+    def centers(self):
+        """Return the bin centers."""
+        centers = (self.__edges[:-1] + self.__edges[1:]) / 2
+        centers.flags.writeable = False
+
+        return centers
+
+    @cached_property
+    def widths(self):
+        """Return the bin widths."""
+        widths = np.diff(self.__edges)
+        widths.flags.writeable = False
+
+        return widths
+
+    def index(self, data):
+        """Return the bin index for each value (-1 if out of range or nan)."""
+        return bin_indices(data, self.__edges, self.spacing)
+
+    def merge_indices(self, rebin):
+        """Return the indices of the edges kept when merging neighbouring bins.
+
+        'rebin' is either a factor, i.e. this many bins are merged (the last
+        bin merges the remaining ones), or new edges which must be a subset
+        of the edges. Bins outside of new edges are dropped.
+        """
+        if np.ndim(rebin) == 0:
+            if rebin < 1 or int(rebin) != rebin:
+                raise ValueError(f"Rebin factor must be a positive integer, got {rebin}!")
+            return np.append(np.arange(0, self.n_bins, int(rebin)), self.n_bins)
+
+        edges = np.asarray(rebin, dtype=np.float64)
+        if edges.ndim != 1 or edges.size < 2:
+            raise ValueError("Bin edges must be a 1d array with at least two entries!")
+        # Allow rounding errors, e.g. of edges from another 'np.linspace'
+        tolerance = 1e-6 * self.widths.min()
+        indices = np.searchsorted(self.__edges, edges - tolerance)
+        matched = np.abs(self.__edges[np.minimum(indices, self.n_bins)] - edges) <= tolerance
+        if not np.all(matched):
+            raise ValueError(f"New edges {edges[~matched]} are no bin edges!")
+        if np.any(np.diff(indices) <= 0):
+            raise ValueError("Bin edges must increase monotonically!")
+
+        return indices
+
+    def range_indices(self, low=None, high=None):
+        """Return the indices of the edges of all bins overlapping [low, high].
+
+        None is an open bound.
+        """
+        start = 0
+        if low is not None:
+            start = max(np.searchsorted(self.__edges, low, side="right") - 1, 0)
+        stop = self.n_bins
+        if high is not None:
+            stop = min(np.searchsorted(self.__edges, high, side="left"), self.n_bins)
+        if start >= stop:
+            raise ValueError(f"No bins overlap the range [{low}, {high}]!")
+
+        return np.arange(start, stop + 1)
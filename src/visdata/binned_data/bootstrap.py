@@ -0,0 +1,117 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from .segments import segment_counts, segment_statistic
+from .sharing import SharedArrays, attach_shared_arrays, chunk_bounds, shared_array
+
+_RESAMPLE_BLOCK_SIZE = 2**20
+
+
+def resample_segments(offsets, rng):
+    """Draw bootstrap multiplicities for all segments at once.
+
+    Each segment is resampled with replacement to its own size, the result
+    is how often each entry is drawn. Repeating the entries accordingly
+    ('np.repeat') keeps values sorted within segments sorted, i.e. a resample
+    costs O(N) without sorting. The draws are made in blocks of
+    '_RESAMPLE_BLOCK_SIZE' entries to bound the temporary memory.
+    """
+    counts = segment_counts(offsets)
+    multiplicities = np.zeros(offsets[-1], dtype=np.intp)
+
+    for start, stop in chunk_bounds(offsets[-1], _RESAMPLE_BLOCK_SIZE):
+        # Segments overlapping the block and their share of it
+        low = np.searchsorted(offsets, start, side="right") - 1
+        high = np.searchsorted(offsets, stop, side="left")
+        segments = np.repeat(
+            np.arange(low, high), np.diff(np.clip(offsets[low : high + 1], start, stop))
+        )
+
+        # Uniform position within the own segment, built in place
+        draws = rng.random(stop - start)
+        draws *= counts[segments]
+        np.floor(draws, out=draws)
+        draws += offsets[segments]
+        np.add.at(multiplicities, draws.astype(np.intp), 1)
+
+    return multiplicities
+
+
+def bootstrap_replicates(sorted_values, offsets, seeds, name, *args, weights=None):
+    """Return the statistic 'name' for one resample of the segments per seed."""
+    replicates = []
+    for seed in seeds:
+        multiplicities = resample_segments(offsets, np.random.default_rng(seed))
+        replicates.append(
+            segment_statistic(
+                name,
+                np.repeat(sorted_values, multiplicities),
+                offsets,
+                *args,
+                weights=None if weights is None else np.repeat(weights, multiplicities),
+            )
+        )
+
+    return np.array(replicates)
+
+
+def _shared_bootstrap_replicates(seeds, name, args):
+    """Calculate bootstrap replicates of the shared segments."""
+    try:
+        weights = shared_array("weights")
+    except KeyError:
+        weights = None
+
+    return bootstrap_replicates(
+        shared_array("values"),
+        shared_array("offsets"),
+        seeds,
+        name,
+        *args,
+        weights=weights,
+    )
+
+
+def bootstrap_errors(
+    sorted_values,
+    offsets,
+    name,
+    *args,
+    weights=None,
+    n_resamples=200,
+    seed=None,
+    n_workers=1,
+):
+    """Return the bootstrap standard error of the statistic 'name' per segment.
+
+    Every resample gets its own random generator spawned from 'seed', i.e. the
+    errors are reproducible for a given seed and do not depend on the number
+    of worker processes 'n_workers' which share the data in shared memory.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_resamples)
+
+    if n_workers == 1:
+        replicates = bootstrap_replicates(
+            sorted_values, offsets, seeds, name, *args, weights=weights
+        )
+    else:
+        arrays = {"values": sorted_values, "offsets": offsets}
+        if weights is not None:
+            arrays["weights"] = weights
+        with SharedArrays(**arrays) as shared:
+            with ProcessPoolExecutor(
+                n_workers, initializer=attach_shared_arrays, initargs=(shared.specs,)
+            ) as pool:
+                block_size = -(-n_resamples // n_workers)
+                blocks = pool.map(
+                    _shared_bootstrap_replicates,
+                    [seeds[start:stop] for start, stop in chunk_bounds(n_resamples, block_size)],
+                    repeat(name),
+                    repeat(args),
+                )
+                replicates = np.concatenate(list(blocks))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.std(replicates, axis=0, ddof=1)
@@ -0,0 +1,362 @@
+import operator
+
+import numpy as np
+
+from .binning import BinAxis, xy_bins
+from .out_of_core import window_bounds, windowed_bin_axis
+from .segments import bin_counts, bin_sums
+from .sharing import reduce_chunks
+from .storage import load_arrays, save_arrays
+
+
+def merge_bins(values, edge_indices, axis=0):
+    """Sum the values of the bins between the kept edges along 'axis'.
+
+    'edge_indices' are increasing indices of the kept edges, see
+    'BinAxis.merge_indices' and 'BinAxis.range_indices'.
+    """
+    values = np.asarray(values)
+    selection = [slice(None)] * values.ndim
+    selection[axis] = slice(edge_indices[0], edge_indices[-1])
+
+    return np.add.reduceat(
+        values[tuple(selection)], edge_indices[:-1] - edge_indices[0], axis=axis
+    )
+
+
+class BinnedCounts1d:
+
+    def __init__(self, axis, counts, sum_weights2=None):
+        """Counts of a 1D histogram, e.g. a projection of BinnedCounts2d.
+
+        'sum_weights2' is the sum of squared weights for each bin, None for
+        unweighted counts.
+        """
+        self.__axis = axis if isinstance(axis, BinAxis) else BinAxis(axis)
+        counts = np.asarray(counts)
+        if counts.shape != (self.__axis.n_bins,):
+            raise ValueError(
+                f"Shape of counts {counts.shape} does not match the axis {(self.__axis.n_bins,)}!"
+            )
+        if sum_weights2 is not None:
+            sum_weights2 = np.asarray(sum_weights2)
+            if sum_weights2.shape != counts.shape:
+                raise ValueError(
+                    f"Shapes of sum_weights2 {sum_weights2.shape} and counts {counts.shape} do not match!"
+                )
+        self.__counts = counts
+        self.__sum_weights2 = sum_weights2
+
+    def __select(self, edge_indices):
+        """Return the counts merged to the kept edges."""
+        return BinnedCounts1d(
+            self.__axis.edges[edge_indices],
+            merge_bins(self.__counts, edge_indices),
+            None
+            if self.__sum_weights2 is None
+            else merge_bins(self.__sum_weights2, edge_indices),
+        )
+
+    def rebin(self, rebin):
+        """Return the counts with merged bins, see 'BinAxis.merge_indices'."""
+        return self.__select(self.__axis.merge_indices(rebin))
+
+    def slice(self, low=None, high=None):
+        """Return the counts of the bins overlapping [low, high]."""
+        return self.__select(self.__axis.range_indices(low, high))
+
+    @property
+    def axis(self):
+        """Return the axis of the bins."""
+        return self.__axis
+
+    @property
+    def counts(self):
+        """Return the counts of the bins."""
+        return self.__counts
+
+    @property
+    def sum_weights2(self):
+        """Return the sum of squared weights of the bins (the counts if unweighted)."""
+        return self.__counts if self.__sum_weights2 is None else self.__sum_weights2
+
+    @property
+    def errors(self):
+        """Return the statistical error of the bins, sqrt(sum of squared weights)."""
+        return np.sqrt(self.sum_weights2)
+
+    def densities(self):
+        """Return the counts normalized to unit integral like 'np.histogram'."""
+        return self.__counts / (self.__counts.sum() * self.__axis.widths)
+
+
+class BinnedCounts2d:
+
+    def __init__(self, x_axis, y_axis, counts=None, sum_weights2=None):
+        """Counts of a 2D histogram with fixed x and y axes (edges or BinAxis).
+
+        The counts have the shape (n_x_bins, n_y_bins) like 'np.histogram2d',
+        the marginal counts are their sums, i.e. they only contain entries
+        inside of both axes. Counts can be filled chunk by chunk and merged
+        exactly, they are integers unless weights are filled (float64).
+        Filling weights also keeps the sum of squared weights of each cell
+        for the 'errors', 'sum_weights2' is None as long as all weights are 1.
+        """
+        self.__x_axis = x_axis if isinstance(x_axis, BinAxis) else BinAxis(x_axis)
+        self.__y_axis = y_axis if isinstance(y_axis, BinAxis) else BinAxis(y_axis)
+        shape = (self.__x_axis.n_bins, self.__y_axis.n_bins)
+        if counts is None:
+            counts = np.zeros(shape, dtype=np.int64)
+        else:
+            counts = np.asarray(counts)
+            if counts.shape != shape:
+                raise ValueError(
+                    f"Shape of counts {counts.shape} does not match the axes {shape}!"
+                )
+        if sum_weights2 is not None:
+            sum_weights2 = np.asarray(sum_weights2)
+            if sum_weights2.shape != shape:
+                raise ValueError(
+                    f"Shape of sum_weights2 {sum_weights2.shape} does not match the axes {shape}!"
+                )
+        self.__counts = counts
+        self.__sum_weights2 = sum_weights2
+        self.__version = 0
+
+    @classmethod
+    def from_data(cls, x, y, bins=10, weights=None, max_memory=None, n_threads=1):
+        """Bin the (optionally weighted) data with 'np.histogram2d' style bins.
+
+        With 'max_memory' (in bytes) the data is binned in windows which need
+        at most about this much memory, e.g. for memory-mapped arrays. See
+        'fill' for 'n_threads'.
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        if x.shape != y.shape:
+            raise ValueError(f"Shapes of x {x.shape} and y {y.shape} do not match!")
+
+        bins_x, bins_y = xy_bins(bins)
+        x_axis = windowed_bin_axis(x, bins_x, max_memory)
+        y_axis = windowed_bin_axis(y, bins_y, max_memory)
+        binned_counts = cls(x_axis, y_axis)
+        for start, stop in window_bounds(max_memory, x, y, weights):
+            binned_counts.fill(
+                x[start:stop],
+                y[start:stop],
+                weights=None if weights is None else weights[start:stop],
+                n_threads=n_threads,
+            )
+
+        return binned_counts
+
+    def fill(self, x, y, weights=None, n_threads=1, chunk_size=2**20):
+        """Add a chunk of data to the counts (the sum of weights with weights).
+
+        The sums of weights and squared weights are binned in the same pass.
+        With 'n_threads' (None for all available CPUs) the data is split into
+        chunks of 'chunk_size' which are binned by threads into private counts,
+        these are summed in chunk order as they arrive, i.e. the result does
+        not depend on the number of threads and the memory grows with the
+        number of threads, not with the number of entries.
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        if x.shape != y.shape:
+            raise ValueError(f"Shapes of x {x.shape} and y {y.shape} do not match!")
+        if weights is not None:
+            weights = np.asarray(weights)
+            if weights.shape != x.shape:
+                raise ValueError(
+                    f"Shapes of weights {weights.shape} and x {x.shape} do not match!"
+                )
+
+        size = self.__counts.size
+
+        def chunk_sums(start, stop):
+            x_ids = self.__x_axis.index(x[start:stop])
+            y_ids = self.__y_axis.index(y[start:stop])
+            # One flat index per entry, -1 if outside of either axis
+            flat_ids = np.where(
+                (x_ids >= 0) & (y_ids >= 0), x_ids * self.__y_axis.n_bins + y_ids, -1
+            )
+            if weights is None:
+                return bin_counts(flat_ids, size)
+            chunk_weights = weights[start:stop]
+            return np.stack(
+                (
+                    bin_sums(flat_ids, chunk_weights, size),
+                    bin_sums(flat_ids, chunk_weights**2, size),
+                )
+            )
+
+        # Private sums of each chunk are added in place to a running total
+        sums = reduce_chunks(chunk_sums, operator.iadd, x.size, chunk_size, n_threads)
+        if weights is None:
+            counts = sum_weights2 = sums
+        else:
+            counts, sum_weights2 = sums
+            if self.__sum_weights2 is None:
+                # All weights were 1 so far
+                self.__sum_weights2 = self.__counts.astype(np.float64)
+            if self.__counts.dtype != np.float64:
+                self.__counts = self.__counts.astype(np.float64)
+
+        # Copy read-only arrays, e.g. memory-mapped by 'load'
+        if not self.__counts.flags.writeable:
+            self.__counts = np.array(self.__counts)
+        self.__counts += counts.reshape(self.__counts.shape)
+        if self.__sum_weights2 is not None:
+            if not self.__sum_weights2.flags.writeable:
+                self.__sum_weights2 = np.array(self.__sum_weights2)
+            self.__sum_weights2 += sum_weights2.reshape(self.__counts.shape)
+        self.__version += 1
+
+        return self
+
+    def merge(self, other):
+        """Return new counts combining these and 'other'."""
+        if not isinstance(other, BinnedCounts2d):
+            raise TypeError(
+                f"Can't merge {self.__class__.__name__} with {type(other).__name__}!"
+            )
+        if self.__x_axis != other.__x_axis or self.__y_axis != other.__y_axis:
+            raise ValueError("Can't merge counts with different bin edges!")
+
+        sum_weights2 = None
+        if self.__sum_weights2 is not None or other.__sum_weights2 is not None:
+            sum_weights2 = self.sum_weights2 + other.sum_weights2
+
+        return BinnedCounts2d(
+            self.__x_axis, self.__y_axis, self.__counts + other.__counts, sum_weights2
+        )
+
+    def __add__(self, other):
+        if not isinstance(other, BinnedCounts2d):
+            return NotImplemented
+
+        return self.merge(other)
+
+    def __select(self, x_indices=None, y_indices=None):
+        """Return the counts merged to the kept x and y edges (all if None)."""
+        x_axis, y_axis = self.__x_axis, self.__y_axis
+        arrays = [self.__counts, self.__sum_weights2]
+        if x_indices is not None:
+            x_axis = BinAxis(x_axis.edges[x_indices])
+            arrays = [
+                None if values is None else merge_bins(values, x_indices, axis=0)
+                for values in arrays
+            ]
+        if y_indices is not None:
+            y_axis = BinAxis(y_axis.edges[y_indices])
+            arrays = [
+                None if values is None else merge_bins(values, y_indices, axis=1)
+                for values in arrays
+            ]
+
+        return BinnedCounts2d(x_axis, y_axis, *arrays)
+
+    def rebin(self, x=None, y=None):
+        """Return new counts with merged x and/or y bins.
+
+        Each rebinning is a factor or new edges, see 'BinAxis.merge_indices'.
+        """
+        return self.__select(
+            None if x is None else self.__x_axis.merge_indices(x),
+            None if y is None else self.__y_axis.merge_indices(y),
+        )
+
+    def slice(self, x=None, y=None):
+        """Return new counts of the bins overlapping the (low, high) x and/or y range.
+
+        None is an open bound, e.g. 'slice(x=(0, None))'.
+        """
+        return self.__select(
+            None if x is None else self.__x_axis.range_indices(*x),
+            None if y is None else self.__y_axis.range_indices(*y),
+        )
+
+    def project(self, dimension):
+        """Return the counts projected on the 'x' or 'y' axis as BinnedCounts1d."""
+        match dimension:
+            case "x" | "X" | 0:
+                axis, sum_axis = self.__x_axis, 1
+            case "y" | "Y" | 1:
+                axis, sum_axis = self.__y_axis, 0
+            case _:
+                raise ValueError(f"Dimension '{dimension}' unkown, should be 'x' or 'y'!")
+        sum_weights2 = None
+        if self.__sum_weights2 is not None:
+            sum_weights2 = self.__sum_weights2.sum(axis=sum_axis)
+
+        return BinnedCounts1d(axis, self.__counts.sum(axis=sum_axis), sum_weights2)
+
+    def save(self, path):
+        """Save the edges, counts and sum of squared weights as '.npz' (see 'save_arrays')."""
+        arrays = {}
+        if self.__sum_weights2 is not None:
+            arrays["sum_weights2"] = self.__sum_weights2
+        save_arrays(
+            path,
+            "BinnedCounts2d",
+            x_edges=self.__x_axis.edges,
+            y_edges=self.__y_axis.edges,
+            counts=self.__counts,
+            **arrays,
+        )
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load counts saved by 'save', memory-mapped with 'mmap_mode' (see 'load_arrays')."""
+        arrays = load_arrays(path, "BinnedCounts2d", mmap_mode=mmap_mode)
+
+        return cls(
+            arrays["x_edges"],
+            arrays["y_edges"],
+            arrays["counts"],
+            arrays.get("sum_weights2"),
+        )
+
+    @property
+    def x_axis(self):
+        """Return the axis of the x bins."""
+        return self.__x_axis
+
+    @property
+    def y_axis(self):
+        """Return the axis of the y bins."""
+        return self.__y_axis
+
+    @property
+    def version(self):
+        """Return the number of fills, e.g. to detect outdated derived counts."""
+        return self.__version
+
+    @property
+    def counts(self):
+        """Return the counts, shape (n_x_bins, n_y_bins)."""
+        return self.__counts
+
+    @property
+    def sum_weights2(self):
+        """Return the sum of squared weights of each cell (the counts if unweighted)."""
+        return self.__counts if self.__sum_weights2 is None else self.__sum_weights2
+
+    @property
+    def errors(self):
+        """Return the statistical error of each cell, sqrt(sum of squared weights)."""
+        return np.sqrt(self.sum_weights2)
+
+    @property
+    def x_counts(self):
+        """Return the counts of the x bins (summed over y)."""
+        return self.__counts.sum(axis=1)
+
+    @property
+    def y_counts(self):
+        """Return the counts of the y bins (summed over x)."""
+        return self.__counts.sum(axis=0)
+
+    def densities(self):
+        """Return the counts normalized to unit integral like 'np.histogram2d'."""
+        return self.__counts / (
+            self.__counts.sum() * np.outer(self.__x_axis.widths, self.__y_axis.widths)
+        )
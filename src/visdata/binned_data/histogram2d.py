@@ -3,12 +3,31 @@ import warnings
 import numpy as np
 from matplotlib import pyplot as plt
 
-from .binning import bin_centers, which_bin
+from .binning import BinAxis, which_bin, xy_bins
+from .counts import BinnedCounts2d
+from .out_of_core import (
+    load_columns,
+    sorting_fits,
+    window_bounds,
+    windowed_bin_axis,
+    windowed_bin_indices,
+    windowed_moments,
+    windowed_sketch,
+    windowed_unique,
+)
+from .pyramid import CountsPyramid
+from .storage import save_arrays
+from .segments import BinnedData, bin_counts, sort_segments
+from .segment_statistics import SegmentStatistics
 
 
 class Profile2dPlotConfig:
 
     def __init__(self, quantity, err=None, **kwargs):
+        """Configure how to plot a quantity, e.g. 'mean', 'median', 'mad' or 'iqr'.
+
+        Quantities with a parameter are given as tuple, e.g. ('trimmed_mean', 0.2).
+        """
         self._quantity = quantity
         self._err = err
         self._options = {"linestyle": "", "barsabove": True, "label": f"{quantity} with {err}"}
@@ -57,13 +76,59 @@ class Profile2dPlotConfigMedian(Profile2dPlotConfig):
         super().__init__("median", err=err, **options)
 
 
-class Profile2d:
+class Profile2dPlotConfigBand(Profile2dPlotConfig):
+
+    def __init__(self, quantiles=(0.16, 0.84), **kwargs):
+        """Draw a shaded band between two quantiles of each x bin."""
+        if len(quantiles) != 2:
+            raise ValueError(f"A band needs two quantiles, got {quantiles}!")
+        super().__init__("band")
+        self._quantiles = tuple(quantiles)
+        # Set and patch default options, passed to 'ax.fill_between'
+        self._options = {
+            "color": "deeppink",
+            "alpha": 0.3,
+            "linewidth": 0,
+            "label": f"{100 * quantiles[0]:g}% to {100 * quantiles[1]:g}% quantiles",
+        }
+        self._options.update(kwargs)
 
-    def __init__(self, x, y, bins=10, **kwargs):
-        """Calculate the profile for a 2d data problem."""
+    @property
+    def quantiles(self):
+        return self._quantiles
+
+
+def x_bins(bins):
+    """Return the x binning of 'np.histogram2d' style bins."""
+    return xy_bins(bins)[0]
+
+
+class Profile2d(SegmentStatistics):
+
+    def __init__(
+        self,
+        x,
+        y,
+        bins=10,
+        weights=None,
+        groups=None,
+        max_memory=None,
+        quantile_accuracy=0.01,
+        **kwargs,
+    ):
+        """Calculate the profile for a 2d data problem (optionally weighted).
+
+        With 'groups' (a label for each entry) the statistics have the shape
+        (n_groups, n_bins), ordered like the sorted labels. With 'max_memory' (in
+        bytes) the data is processed in windows, see 'from_npy'.
+        """
         self.__data_x = x
         self.__data_y = y
         self.__bins = bins
+        self.__data_weights = weights
+        self.__data_groups = groups
+        self.__max_memory = max_memory
+        self.__quantile_accuracy = quantile_accuracy
 
         # This will be deleted in the future
         if "numpy_bin_filter" in kwargs.keys():
@@ -78,139 +143,332 @@ class Profile2d:
             )
 
         self.__bin_data()
-        self.__calculate_statistics()
+        self.__sketch = None
+        super().__init__()
+
+    @classmethod
+    def from_npy(
+        cls,
+        path,
+        x="x",
+        y="y",
+        weights=None,
+        bins=10,
+        max_memory=2**28,
+        quantile_accuracy=0.01,
+    ):
+        """Create the profile from columns stored as '.npy' (see 'load_columns').
+
+        The columns are memory-mapped and processed in windows of at most
+        'max_memory' bytes, only the compact bin indices are kept. If sorting
+        all y data does not fit, the medians and quantiles are estimated from
+        a QuantileSketch with the relative accuracy 'quantile_accuracy' and
+        the statistics which need the sorted data raise a ValueError.
+        """
+        columns = (x, y) if weights is None else (x, y, weights)
+        x_data, y_data, *weights_data = load_columns(path, *columns)
+
+        return cls(
+            x_data,
+            y_data,
+            bins=bins,
+            weights=weights_data[0] if weights_data else None,
+            max_memory=max_memory,
+            quantile_accuracy=quantile_accuracy,
+        )
 
     def __bin_data(self):
-        """Sort the data into the right bins."""
-        x_data = self.__data_x
-        y_data = self.__data_y
+        """Find the x bin of each entry."""
+        x_data = np.asarray(self.__data_x)
+        self.__y = np.asarray(self.__data_y)
+        if self.__data_weights is None:
+            self.__weights = None
+        else:
+            self.__weights = np.asarray(self.__data_weights)
+            if self.__weights.shape != self.__y.shape:
+                raise ValueError(
+                    f"Shapes of weights {self.__weights.shape} and y {self.__y.shape} do not match!"
+                )
+
+        if x_data.shape != self.__y.shape:
+            raise ValueError(f"Shapes of x {x_data.shape} and y {self.__y.shape} do not match!")
+
+        axis = windowed_bin_axis(x_data, x_bins(self.__bins), self.__max_memory)
 
         if self.__numpy_bin_filter:
             # Filter using numpy, much faster
-            _hist, bin_x_edges, _bin_y_edges = np.histogram2d(
-                x_data, y_data, self.__bins
+            index = axis.index
+        else:
+            # Custom filter, here for historical reasons (now vectorized too)
+            def index(data):
+                return which_bin(data, axis.edges).filled(-1)
+
+        self.__axis = axis
+        if self.__data_groups is None:
+            self.__groups = None
+            self.__n_segments = axis.n_bins
+            self.__bin_ids = windowed_bin_indices(
+                index, axis.n_bins, self.__max_memory, x_data
             )
+            return
 
-            bin_data = [
-                y_data[(bin_x_edges[idx] <= x_data) & (x_data < bin_x_edges[idx + 1])]
-                for idx in range(bin_x_edges.size - 1)
-            ]
-            # Righthand-most bin is closed and not half-open!
-            bin_data[-1] = np.append(bin_data[-1], y_data[x_data == bin_x_edges[-1]])
-        else:
-            # Custom filter, much slower, here for historical reasons
-            _hist, bin_x_edges = np.histogram(x_data, self.__bins)
-
-            bin_data = [[] for idx in range(len(bin_x_edges) - 1)]
-
-            for x, y in zip(x_data, y_data):
-                bin_id = which_bin(x, bin_x_edges)
-                bin_data[bin_id].append(y)
-
-        self.__binned_data = bin_data
-        self.__bin_edges = bin_x_edges
-
-    def __calculate_statistics(self):
-        """Calculate the statistics for each x bin."""
-        self.__means, self.__stds, self.__sems, self.__medians = [], [], [], []
-        for data in self.__binned_data:
-            if (self.__numpy_bin_filter and data.size > 0) or (
-                not self.__numpy_bin_filter and data
-            ):
-                mean = np.mean(data)
-                std = np.std(data, ddof=1)
-                sem = std / np.sqrt(np.size(data))
-                median = np.median(data)
-            else:
-                mean, std, sem, median = np.nan, np.nan, np.nan, np.nan
-            self.__means.append(mean)
-            self.__stds.append(std)
-            self.__sems.append(sem)
-            self.__medians.append(median)
+        groups = np.asarray(self.__data_groups)
+        if groups.shape != self.__y.shape:
+            raise ValueError(
+                f"Shapes of groups {groups.shape} and y {self.__y.shape} do not match!"
+            )
+        self.__groups = windowed_unique(groups, self.__max_memory)
+        self.__n_segments = self.__groups.size * axis.n_bins
+
+        def group_index(data, group_data):
+            # The segment of group 'idx' and x bin 'jdx' is 'idx * n_bins + jdx'
+            bin_ids = index(data)
+            group_ids = np.searchsorted(self.__groups, group_data)
+            return np.where(bin_ids >= 0, group_ids * axis.n_bins + bin_ids, -1)
+
+        self.__bin_ids = windowed_bin_indices(
+            group_index, self.__n_segments, self.__max_memory, x_data, groups
+        )
+
+    def _shape_results(self, values):
+        """Return results of all segments as (n_groups, n_bins, ...) if grouped."""
+        if self.__groups is None:
+            return values
+
+        return values.reshape(self.__groups.size, self.__axis.n_bins, *values.shape[1:])
+
+    def __windows(self):
+        """Return the windows of the data, see 'max_memory'."""
+        return window_bounds(self.__max_memory, self.__y, self.__weights)
+
+    def _compute_moments(self):
+        """Return the (weighted) moments of all x bins window by window."""
+        return windowed_moments(
+            self.__bin_ids,
+            self.__y,
+            self.__n_segments,
+            self.__max_memory,
+            weights=self.__weights,
+        )
+
+    def _sorting_fits(self):
+        """Return whether sorting all y data fits into 'max_memory'."""
+        return sorting_fits(self.__max_memory, self.__y, self.__weights)
+
+    def _sketch_quantiles(self, q):
+        """Return the quantiles 'q' of all bins from a sketch filled window by window."""
+        if self.__sketch is None:
+            self.__sketch = windowed_sketch(
+                self.__bin_ids,
+                self.__y,
+                self.__n_segments,
+                self.__max_memory,
+                weights=self.__weights,
+                relative_accuracy=self.__quantile_accuracy,
+            )
+
+        return self.__sketch.quantiles(q)
+
+    def _sort_segments(self):
+        """Return the data sorted by bin and value."""
+        if not self._sorting_fits():
+            raise ValueError(
+                "Sorting all y data for 'bin_data' or robust statistics exceeds "
+                f"'max_memory' ({self.__max_memory} bytes)!"
+            )
+
+        return sort_segments(
+            self.__bin_ids, self.__y, self.__n_segments, weights=self.__weights
+        )
+
+    @property
+    def bin_axis(self):
+        """Return the axis of the x bins."""
+        return self.__axis
 
     @property
     def bin_centers(self):
-        """Return the edges for the x bins."""
-        return bin_centers(self.__bin_edges)
+        """Return the centers for the x bins."""
+        return self.__axis.centers
+
+    @property
+    def groups(self):
+        """Return the sorted unique group labels (None without groups)."""
+        return self.__groups
+
+    @property
+    def bin_counts(self):
+        """Return the number of entries for each x bin."""
+        return self._shape_results(
+            sum(
+                bin_counts(self.__bin_ids[start:stop], self.__n_segments)
+                for start, stop in self.__windows()
+            )
+        )
 
     @property
     def bin_data(self):
-        """Return the data for the x bins."""
-        return self.__binned_data
+        """Return the data for the x bins (bin_data[idx] is a view).
+
+        The values of each bin are sorted by value, not in input order.
+
+        With groups, the data of group 'idx' and x bin 'jdx' is
+        'bin_data[idx * n_bins + jdx]'.
+        """
+        sorted_data, offsets, _ = self._get_layout()
+
+        return BinnedData(sorted_data, offsets)
 
     @property
     def bin_edges(self):
         """Return the edges for the x bins."""
-        return self.__bin_edges
+        return self.__axis.edges
 
-    @property
-    def bin_means(self):
-        """Return the means for each x bin."""
-        return self.__means
+    def save(self, path, quantities=("mean", "std", "sem", "median")):
+        """Save the edges, counts and statistics 'quantities' as '.npz'.
 
-    @property
-    def bin_medians(self):
-        """Return the medians for each x bin."""
-        return self.__medians
+        Load them with 'BinnedProfile2d.load' to plot without the raw data.
+        """
+        arrays = {
+            "edges": self.bin_edges,
+            "counts": self.bin_counts,
+            "effective_counts": self.bin_effective_counts,
+        }
+        if self.__groups is not None:
+            arrays["groups"] = self.__groups
+        for name in quantities:
+            arrays[f"statistic_{name}"] = self.statistic(name)
+
+        save_arrays(path, "Profile2d", **arrays)
+
+    def add_to_axis(self, ax, *configs: Profile2dPlotConfig, group=None):
+        """Add the profile to the given axis, only the needed statistics are calculated.
+
+        A grouped profile is drawn for the given 'group' label.
+        """
+        if self.__groups is None:
+            if group is not None:
+                raise ValueError(f"Can't select group '{group}', the profile has no groups!")
+            statistic = self.statistic
+        elif group is None:
+            raise ValueError("Select a group to draw a grouped profile!")
+        else:
+            matches = np.flatnonzero(self.__groups == group)
+            if not matches.size:
+                raise ValueError(f"Unknown group '{group}'!")
 
-    @property
-    def bin_stds(self):
-        """Return the standard deviations for each x bin."""
-        return self.__stds
+            def statistic(quantity, *args):
+                return self.statistic(quantity, *args)[matches[0]]
 
-    @property
-    def bin_sems(self):
-        """Return the standard error of the mean for each x bin."""
-        return self.__sems
-
-    def add_to_axis(self, ax, *configs: Profile2dPlotConfig):
-        """Add the profile to the given axis."""
-        add_profile2d_to_axis(
-            ax,
-            self.bin_centers,
-            self.bin_means,
-            self.bin_sems,
-            self.bin_stds,
-            self.bin_medians,
-            *configs,
-        )
+        add_profile2d_configs_to_axis(ax, self.bin_centers, statistic, *configs)
 
 
 def add_profile2d_to_axis(
     ax, xcenter, mean, sem, std, median, *configs: Profile2dPlotConfig
 ):
-    """Add profile2d plot to given axis."""
+    """Add profile2d plot to given axis ('xcenter' may be a BinAxis)."""
+    statistics = {"mean": mean, "sem": sem, "std": std, "median": median}
+
+    def statistic(name):
+        try:
+            return statistics[name]
+        except KeyError:
+            raise ValueError(f"Unknown quantity '{name}'!") from None
+
+    add_profile2d_configs_to_axis(ax, xcenter, statistic, *configs)
+
+
+def add_profile2d_configs_to_axis(
+    ax, xcenter, statistic, *configs: Profile2dPlotConfig
+):
+    """Add profile2d plot to given axis getting the data from 'statistic'.
+
+    'statistic' returns the values for a quantity name (e.g. 'mean' or
+    'quantiles' with the quantiles as argument), None if it is not available.
+    It is only called for the quantities in 'configs'.
+    """
+    if isinstance(xcenter, BinAxis):
+        xcenter = xcenter.centers
     if not len(configs):
         configs = (Profile2dPlotConfigMedian(), Profile2dPlotConfigMean())
 
     for config in configs:
-        match config.quantity:
-            case "mean":
-                data = mean
-            case "median":
-                data = median
-            case _:
-                raise ValueError(f"Unknown quantity '{config.quantity}'!")
+        if config.quantity == "band":
+            quantiles = statistic("quantiles", config.quantiles)
+            if quantiles is None:
+                raise ValueError(f"Quantiles {config.quantiles} are not available!")
+            lower, upper = quantiles.T
+            ax.fill_between(xcenter, lower, upper, **config.options)
+            continue
+
+        # Quantities with parameters are given as tuple, e.g. ('trimmed_mean', 0.2)
+        if isinstance(config.quantity, str):
+            quantity = (config.quantity,)
+        else:
+            quantity = tuple(config.quantity)
+        data = statistic(*quantity)
+        if data is None:
+            raise ValueError(f"Quantity '{config.quantity}' is not available!")
 
         match config.err:
             case "sem" | "standard error on the mean":
-                yerr = sem
+                yerr = statistic("sem")
             case "std" | "standard deviation":
-                yerr = std
+                yerr = statistic("std")
+            case "mad" | "median absolute deviation":
+                yerr = statistic("mad")
+            case "bootstrap":
+                yerr = statistic("bootstrap", *quantity)
             case 0 | None | False:
                 yerr = None
             case _:
                 raise ValueError(f"Unknown error quantity '{config.err}'!")
+        if config.err and yerr is None:
+            raise ValueError(
+                f"Error quantity '{config.err}' of '{config.quantity}' is not available!"
+            )
 
         ax.errorbar(xcenter, data, yerr=yerr, **config.options)
 
 
 class Histogram2d:
 
-    def __init__(self, x, y, bins=10, xlabel=None, ylabel=None, clabel=None):
+    def __init__(
+        self,
+        x,
+        y,
+        bins=10,
+        xlabel=None,
+        ylabel=None,
+        clabel=None,
+        max_memory=None,
+        n_threads=1,
+        weights=None,
+    ):
+        """2D-histogram with optional marginal histograms and profile.
+
+        The data is binned once into 'binned_counts' which is drawn with
+        'pcolormesh', the marginal histograms are its sums drawn with 'stairs'
+        and the profile uses the same x bins. With 'max_memory' (in bytes)
+        the data, e.g. memory-mapped arrays, is binned in windows which need
+        at most about this much memory. With 'n_threads' the data is binned
+        by threads, see 'BinnedCounts2d.fill'. With 'weights' the counts are
+        the sums of weights, their errors come from the sums of squared
+        weights binned in the same pass (see 'BinnedCounts2d.errors').
+
+        Histograms with fixed axes can be filled chunk by chunk ('fill',
+        'from_axes') and merged ('merge' or '+') without keeping any raw data,
+        the profile needs the raw data though. For zooming into large
+        histograms 'hist2d' can draw a coarser level of the 'pyramid'.
+        """
         self._x = x
         self._y = y
+        self._weights = weights
         self._bins = bins
+        self._max_memory = max_memory
+        self._n_threads = n_threads
+        self._counts = None
+        self._pyramid = None
 
         self.xlabel = xlabel if xlabel is not None else "$x$-data"
         self.ylabel = ylabel if ylabel is not None else "$y$-data"
@@ -220,6 +478,120 @@ class Histogram2d:
         self.configure_marginal_grid()
         self.configure_profile()
 
+    @classmethod
+    def from_npy(
+        cls, path, x="x", y="y", weights=None, bins=10, max_memory=2**28, **kwargs
+    ):
+        """Create the histogram from columns stored as '.npy' (see 'load_columns').
+
+        The columns are memory-mapped and binned in windows of at most
+        'max_memory' bytes.
+        """
+        columns = (x, y) if weights is None else (x, y, weights)
+        x_data, y_data, *weights_data = load_columns(path, *columns)
+
+        return cls(
+            x_data,
+            y_data,
+            bins=bins,
+            weights=weights_data[0] if weights_data else None,
+            max_memory=max_memory,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_counts(cls, binned_counts, **kwargs):
+        """Create the histogram from BinnedCounts2d, no raw data needed."""
+        hist = cls(None, None, bins=(binned_counts.x_axis, binned_counts.y_axis), **kwargs)
+        hist._counts = binned_counts
+
+        return hist
+
+    @classmethod
+    def from_axes(cls, x_axis, y_axis, **kwargs):
+        """Create an empty histogram with fixed axes (edges or BinAxis) to fill."""
+        return cls.from_counts(BinnedCounts2d(x_axis, y_axis), **kwargs)
+
+    def save(self, path):
+        """Save the binned counts as '.npz', see 'BinnedCounts2d.save'."""
+        self.binned_counts.save(path)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r", **kwargs):
+        """Load a histogram saved by 'save' (memory-mapped with 'mmap_mode')."""
+        return cls.from_counts(BinnedCounts2d.load(path, mmap_mode=mmap_mode), **kwargs)
+
+    def fill(self, x, y, weights=None):
+        """Add a chunk of data to the counts.
+
+        The raw data given to the constructor is binned first and dropped, the
+        counts are the sum of weights if weights are given.
+        """
+        self.binned_counts.fill(x, y, weights=weights, n_threads=self._n_threads)
+        self._x = self._y = self._weights = None
+
+        return self
+
+    def merge(self, other):
+        """Return a new histogram (without raw data) combining this one and 'other'."""
+        if not isinstance(other, Histogram2d):
+            raise TypeError(
+                f"Can't merge {self.__class__.__name__} with {type(other).__name__}!"
+            )
+
+        return self._with_counts(self.binned_counts + other.binned_counts)
+
+    def __add__(self, other):
+        if not isinstance(other, Histogram2d):
+            return NotImplemented
+
+        return self.merge(other)
+
+    def _with_counts(self, binned_counts):
+        """Return a histogram (without raw data) of other counts with the same labels."""
+        return self.from_counts(
+            binned_counts,
+            xlabel=self.xlabel,
+            ylabel=self.ylabel,
+            clabel=self.clabel,
+            n_threads=self._n_threads,
+        )
+
+    def rebin(self, x=None, y=None):
+        """Return a new histogram with merged bins, see 'BinnedCounts2d.rebin'."""
+        return self._with_counts(self.binned_counts.rebin(x=x, y=y))
+
+    def slice(self, x=None, y=None):
+        """Return a new histogram of an x and/or y range, see 'BinnedCounts2d.slice'."""
+        return self._with_counts(self.binned_counts.slice(x=x, y=y))
+
+    def project(self, dimension):
+        """Return the counts projected on the 'x' or 'y' axis, see 'BinnedCounts2d.project'."""
+        return self.binned_counts.project(dimension)
+
+    @property
+    def binned_counts(self):
+        """Return the counts of the histogram, binned on first use."""
+        if self._counts is None:
+            self._counts = BinnedCounts2d.from_data(
+                self._x,
+                self._y,
+                self._bins,
+                weights=self._weights,
+                max_memory=self._max_memory,
+                n_threads=self._n_threads,
+            )
+
+        return self._counts
+
+    @property
+    def pyramid(self):
+        """Return the CountsPyramid of the counts, built on first use."""
+        if self._pyramid is None:
+            self._pyramid = CountsPyramid(self.binned_counts)
+
+        return self._pyramid
+
     def configure_marginal(self, **kwargs):
         self._marginal_kwargs = kwargs
 
@@ -245,34 +617,80 @@ class Histogram2d:
 
         return fig, ax
 
-    def hist2d(self, subplot=None, colorbar_ax=None, **kwargs):
+    def hist2d(
+        self,
+        subplot=None,
+        colorbar_ax=None,
+        cmin=None,
+        cmax=None,
+        density=False,
+        x_range=None,
+        y_range=None,
+        max_pixels=None,
+        **kwargs,
+    ):
+        """Draw the counts like 'ax.hist2d', keywords are passed to 'ax.pcolormesh'.
+
+        Only the bins overlapping the (low, high) 'x_range' and 'y_range' are
+        drawn (all if None). With 'max_pixels' (a number, an (x, y) pair or
+        'auto' for the size of the axes) the finest level of the 'pyramid'
+        with at most one bin per pixel is drawn, i.e. 'cmin' and 'cmax'
+        apply to its merged counts.
+        """
         fig, ax = self.get_subplot(subplot)
-        hist, xedges, yedges, image = ax.hist2d(self._x, self._y, bins=self._bins, **kwargs)
+        if max_pixels is None:
+            binned_counts = self.binned_counts.slice(x=x_range, y=y_range)
+        else:
+            if isinstance(max_pixels, str):
+                extent = ax.get_window_extent()
+                max_pixels = (max(int(extent.width), 1), max(int(extent.height), 1))
+            binned_counts = self.pyramid.select(x_range, y_range, max_pixels)
+        if density:
+            # Normalize to all counts, i.e. the same densities for any view
+            counts = binned_counts.counts / (
+                self.binned_counts.counts.sum()
+                * np.outer(binned_counts.x_axis.widths, binned_counts.y_axis.widths)
+            )
+        else:
+            counts = binned_counts.counts.astype(np.float64)
+        if cmin is not None:
+            counts[counts < cmin] = np.nan
+        if cmax is not None:
+            counts[counts > cmax] = np.nan
+
+        image = ax.pcolormesh(
+            binned_counts.x_axis.edges, binned_counts.y_axis.edges, counts.T, **kwargs
+        )
         fig.colorbar(image, cax=colorbar_ax, label=self.clabel)
 
         return fig, ax, image
 
-    def hist(self, dimension: str, subplot=None, **kwargs):
-        fig, ax = self.get_subplot(subplot)
-        # Get correct data
-        match dimension:
-            case "x" | "X" | 0:
-                data = self._x
-                bin_dim = 0
-            case "y" | "Y" | 1:
-                data = self._y
-                bin_dim = 1
-            case _:
-                raise ValueError(f"Dimension '{dimension}' unkown, should be 'x' or 'y'!")
+    def hist(
+        self, dimension: str, subplot=None, histtype="bar", density=False, errors=False, **kwargs
+    ):
+        """Draw the marginal counts like 'ax.hist', keywords are passed to 'ax.stairs'.
 
-        # Get correct bins
-        try:
-            bins = self._bins[bin_dim]
-        except TypeError:
-            bins = self._bins
+        With 'errors' the errors of the marginal counts, sqrt(sum of squared
+        weights), are drawn as error bars.
+        """
+        fig, ax = self.get_subplot(subplot)
+        # Get correct marginal counts
+        projection = self.project(dimension)
+        counts, bin_errors = projection.counts, projection.errors
+        if density:
+            scale = 1 / (counts.sum() * projection.axis.widths)
+            counts, bin_errors = counts * scale, bin_errors * scale
 
         # Draw histogram
-        ax.hist(data, bins=bins, **kwargs)
+        kwargs.setdefault("fill", histtype != "step")
+        patch = ax.stairs(counts, projection.axis.edges, **kwargs)
+        if errors:
+            centers = projection.axis.centers
+            ecolor = "black" if kwargs["fill"] else patch.get_edgecolor()
+            if kwargs.get("orientation") == "horizontal":
+                ax.errorbar(counts, centers, xerr=bin_errors, fmt="none", ecolor=ecolor)
+            else:
+                ax.errorbar(centers, counts, yerr=bin_errors, fmt="none", ecolor=ecolor)
 
         return fig, ax
 
@@ -332,7 +750,18 @@ class Histogram2d:
 
         # Add profile
         if profile:
-            profile = Profile2d(self._x, self._y, self._bins)
+            if self._x is None:
+                raise ValueError(
+                    "The profile needs the raw data, which this histogram does not keep!"
+                )
+            # Reuse the x bins of the histogram
+            profile = Profile2d(
+                self._x,
+                self._y,
+                self.binned_counts.x_axis,
+                weights=self._weights,
+                max_memory=self._max_memory,
+            )
             profile.add_to_axis(ax_hist2d, *self._profile_args, **self._profile_kwargs)
 
         # For testing, keep it for now
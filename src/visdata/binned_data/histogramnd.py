@@ -0,0 +1,252 @@
+import math
+
+import numpy as np
+
+from .binning import BinAxis
+from .counts import BinnedCounts2d
+from .histogram2d import Histogram2d
+from .segments import bin_counts, bin_sums
+
+
+def flat_cell_indices(axes, columns):
+    """Return the flat (C order) cell index of each entry, -1 if outside of any axis."""
+    flat_ids = np.zeros(np.shape(columns[0]), dtype=np.int64)
+    inside = np.ones(flat_ids.shape, dtype=bool)
+    for axis, column in zip(axes, columns):
+        bin_ids = axis.index(column)
+        inside &= bin_ids >= 0
+        flat_ids = flat_ids * axis.n_bins + bin_ids
+
+    return np.where(inside, flat_ids, -1)
+
+
+def sum_duplicates(indices, values):
+    """Return the sorted unique indices and the sum of the values of each."""
+    if not indices.size:
+        return indices, values
+
+    order = np.argsort(indices, kind="stable")
+    indices, values = indices[order], values[order]
+    starts = np.flatnonzero(np.concatenate(([True], indices[1:] != indices[:-1])))
+
+    return indices[starts], np.add.reduceat(values, starts)
+
+
+class HistogramNd:
+
+    def __init__(self, axes, sparse=False):
+        """N-dimensional histogram with fixed axes (edges or BinAxis).
+
+        The dense backend keeps all counts in an array of the shape
+        (n_bins_0, n_bins_1, ...). The sparse backend only keeps the occupied
+        cells as sorted flat indices and their counts, i.e. the memory is
+        proportional to the number of occupied cells. Counts are integers
+        unless weights are filled (float64).
+        """
+        self.__axes = tuple(
+            axis if isinstance(axis, BinAxis) else BinAxis(axis) for axis in axes
+        )
+        self.__shape = tuple(axis.n_bins for axis in self.__axes)
+        if math.prod(self.__shape) > np.iinfo(np.int64).max:
+            raise ValueError(f"Too many cells {self.__shape} for flat int64 indices!")
+        self.__sparse = sparse
+
+        if sparse:
+            self.__indices = np.zeros(0, dtype=np.int64)
+            self.__values = np.zeros(0, dtype=np.int64)
+        else:
+            self.__counts = np.zeros(self.__shape, dtype=np.int64)
+
+    @classmethod
+    def from_data(cls, *columns, bins=10, weights=None, sparse=False):
+        """Bin the data columns like 'np.histogramdd'.
+
+        'bins' is the binning (number, edges or BinAxis) for each column or
+        a number or name of a bin edge estimator used for all of them.
+        """
+        columns = [np.asarray(column) for column in columns]
+        if isinstance(bins, (str, BinAxis)) or not hasattr(bins, "__len__"):
+            bins = [bins] * len(columns)
+        if len(bins) != len(columns):
+            raise ValueError(f"Got {len(bins)} binnings for {len(columns)} columns!")
+
+        axes = [
+            BinAxis.from_data(column, column_bins)
+            for column, column_bins in zip(columns, bins)
+        ]
+
+        return cls(axes, sparse=sparse).fill(*columns, weights=weights)
+
+    @property
+    def axes(self):
+        """Return the axes of all dimensions."""
+        return self.__axes
+
+    @property
+    def ndim(self):
+        return len(self.__axes)
+
+    @property
+    def shape(self):
+        return self.__shape
+
+    @property
+    def sparse(self):
+        """Return whether the sparse backend is used."""
+        return self.__sparse
+
+    @property
+    def n_occupied(self):
+        """Return the number of occupied (non-zero) cells."""
+        if self.__sparse:
+            return np.count_nonzero(self.__values)
+
+        return np.count_nonzero(self.__counts)
+
+    @property
+    def occupied(self):
+        """Return the sorted flat indices and counts of the occupied cells."""
+        if self.__sparse:
+            filled = self.__values != 0
+            return self.__indices[filled], self.__values[filled]
+
+        indices = np.flatnonzero(self.__counts)
+
+        return indices, self.__counts.ravel()[indices]
+
+    @property
+    def counts(self):
+        """Return the dense counts (for the sparse backend the array is created)."""
+        if not self.__sparse:
+            return self.__counts
+
+        counts = np.zeros(math.prod(self.__shape), dtype=self.__values.dtype)
+        counts[self.__indices] = self.__values
+
+        return counts.reshape(self.__shape)
+
+    def fill(self, *columns, weights=None):
+        """Add a chunk of data, one column per dimension (the sum of weights with weights)."""
+        if len(columns) != self.ndim:
+            raise ValueError(f"Got {len(columns)} columns for {self.ndim} dimensions!")
+        columns = [np.asarray(column) for column in columns]
+        if any(column.shape != columns[0].shape for column in columns):
+            raise ValueError(
+                f"Shapes of the columns {[column.shape for column in columns]} do not match!"
+            )
+        if weights is not None:
+            weights = np.asarray(weights)
+            if weights.shape != columns[0].shape:
+                raise ValueError(
+                    f"Shapes of weights {weights.shape} and columns {columns[0].shape} do not match!"
+                )
+
+        flat_ids = flat_cell_indices(self.__axes, columns)
+
+        if not self.__sparse:
+            size = self.__counts.size
+            if weights is None:
+                counts = bin_counts(flat_ids, size)
+            else:
+                counts = bin_sums(flat_ids, weights, size)
+                self.__counts = self.__counts.astype(np.float64, copy=False)
+            self.__counts += counts.reshape(self.__shape)
+            return self
+
+        inside = flat_ids >= 0
+        flat_ids = flat_ids[inside]
+        if weights is None:
+            values = np.ones(flat_ids.size, dtype=np.int64)
+        else:
+            values = weights[inside].astype(np.float64)
+        # Both parts are sorted, the stable sort (timsort) merges them in linear time
+        flat_ids, values = sum_duplicates(flat_ids, values)
+        self.__indices, self.__values = sum_duplicates(
+            np.concatenate((self.__indices, flat_ids)),
+            np.concatenate((self.__values, values)),
+        )
+
+        return self
+
+    def to_dense(self):
+        """Return the histogram with the dense backend."""
+        return self.__from_counts(self.__axes, self.counts)
+
+    def to_sparse(self):
+        """Return the histogram with the sparse backend."""
+        hist = HistogramNd(self.__axes, sparse=True)
+        hist.__indices, hist.__values = self.occupied
+
+        return hist
+
+    @classmethod
+    def __from_counts(cls, axes, counts):
+        hist = cls(axes)
+        hist.__counts = counts
+
+        return hist
+
+    def merge(self, other):
+        """Return a new histogram (with this backend) combining this one and 'other'."""
+        if not isinstance(other, HistogramNd):
+            raise TypeError(
+                f"Can't merge {self.__class__.__name__} with {type(other).__name__}!"
+            )
+        if self.__axes != other.__axes:
+            raise ValueError("Can't merge histograms with different bin edges!")
+
+        if not self.__sparse:
+            return self.__from_counts(self.__axes, self.__counts + other.counts)
+
+        hist = HistogramNd(self.__axes, sparse=True)
+        indices, values = other.occupied
+        hist.__indices, hist.__values = sum_duplicates(
+            np.concatenate((self.__indices, indices)),
+            np.concatenate((self.__values, values)),
+        )
+
+        return hist
+
+    def __add__(self, other):
+        if not isinstance(other, HistogramNd):
+            return NotImplemented
+
+        return self.merge(other)
+
+    def project(self, *dims):
+        """Return the (dense) histogram of the given dimensions, summing over the others.
+
+        The dimensions are ordered as given, e.g. 'project(2, 0)' has the
+        shape (n_bins_2, n_bins_0).
+        """
+        if len(set(dims)) != len(dims) or not all(0 <= dim < self.ndim for dim in dims):
+            raise ValueError(f"Invalid dimensions {dims} for {self.ndim} dimensions!")
+        axes = [self.__axes[dim] for dim in dims]
+
+        if not self.__sparse:
+            kept = sorted(dims)
+            others = tuple(dim for dim in range(self.ndim) if dim not in dims)
+            counts = self.__counts.sum(axis=others)
+            counts = counts.transpose([kept.index(dim) for dim in dims])
+            return self.__from_counts(axes, counts)
+
+        shape = [self.__shape[dim] for dim in dims]
+        cells = np.unravel_index(self.__indices, self.__shape)
+        indices, values = sum_duplicates(
+            np.ravel_multi_index([cells[dim] for dim in dims], shape), self.__values
+        )
+        counts = np.zeros(math.prod(shape), dtype=self.__values.dtype)
+        counts[indices] = values
+
+        return self.__from_counts(axes, counts.reshape(shape))
+
+    def histogram2d(self, x_dim=0, y_dim=1, **kwargs):
+        """Return a Histogram2d of the projection on two dimensions.
+
+        Keywords are passed to 'Histogram2d', e.g. the labels.
+        """
+        projection = self.project(x_dim, y_dim)
+
+        return Histogram2d.from_counts(
+            BinnedCounts2d(*projection.axes, projection.counts), **kwargs
+        )
@@ -0,0 +1,161 @@
+import numpy as np
+
+from .binning import BinAxis
+from .histogram2d import Profile2dPlotConfig, add_profile2d_configs_to_axis, x_bins
+from .segment_statistics import SegmentStatistics
+from .segments import (
+    bin_counts,
+    bin_moments,
+    bin_sums,
+    group_segments,
+    moments_statistics,
+    sort_within_segments,
+)
+
+
+class MultiProfile2d(SegmentStatistics):
+
+    def __init__(self, x, y, bins=10, weights=None):
+        """Calculate the profiles of many y variables sharing one x binning.
+
+        'y' is a 2D array with one column per variable or a dict of columns.
+        The x bins are found once and stored with the smallest integer type,
+        the weights are shared by all columns. The sorted data of column
+        'idx' and x bin 'jdx' is the segment 'idx * n_bins + jdx', i.e. all
+        columns share the statistics of 'Profile2d'. Statistics have the
+        shape (n_bins, n_columns), the profile of one column is drawn with
+        'add_to_axis'.
+        """
+        if isinstance(y, dict):
+            self.__names = list(y.keys())
+            y = np.stack([np.asarray(column) for column in y.values()])
+        else:
+            y = np.asarray(y)
+            if y.ndim != 2:
+                raise ValueError(f"y must be a 2D array or a dict of columns, got shape {y.shape}!")
+            self.__names = list(range(y.shape[1]))
+            y = y.T
+        x = np.asarray(x)
+        if x.shape != y.shape[1:]:
+            raise ValueError(f"Shapes of x {x.shape} and y columns {y.shape[1:]} do not match!")
+
+        self.__axis = BinAxis.from_data(x, x_bins(bins))
+        n_bins = self.__axis.n_bins
+        # The indices plus one (see 'sort_segments') have to fit as well
+        self.__bin_ids = self.__axis.index(x).astype(np.min_scalar_type(-(n_bins + 2)))
+        self.__y = y
+        if weights is None:
+            self.__weights = None
+        else:
+            self.__weights = np.asarray(weights)
+            if self.__weights.shape != x.shape:
+                raise ValueError(
+                    f"Shapes of weights {self.__weights.shape} and x {x.shape} do not match!"
+                )
+
+        super().__init__()
+
+    def _shape_results(self, values):
+        """Return results of the (column, x bin) segments as (n_bins, n_columns, ...)."""
+        values = values.reshape(len(self.__names), self.__axis.n_bins, *values.shape[1:])
+
+        return np.moveaxis(values, 0, 1)
+
+    def _compute_moments(self):
+        """Return the (weighted) moments of all columns, no sorting needed."""
+        n_bins, weights = self.__axis.n_bins, self.__weights
+        moments = [
+            bin_moments(self.__bin_ids, column, n_bins, weights=weights)
+            for column in self.__y
+        ]
+        counts, means, m2 = (np.concatenate(values) for values in zip(*moments))
+        if weights is None:
+            sum_weights2 = None
+            effective_counts = counts
+        else:
+            # The weights and thus their sums are the same for all columns
+            sum_weights2 = np.tile(
+                bin_sums(self.__bin_ids, weights**2, n_bins), len(self.__names)
+            )
+            with np.errstate(invalid="ignore", divide="ignore"):
+                effective_counts = counts**2 / sum_weights2
+
+        return (
+            *moments_statistics(counts, means, m2, sum_weights2=sum_weights2),
+            effective_counts,
+        )
+
+    def _sort_segments(self):
+        """Return the data of all columns sorted by segment and value.
+
+        The entries are grouped by x bin once, each column is gathered in
+        this order and sorted within its bins.
+        """
+        n_columns = len(self.__names)
+        order, bin_offsets = group_segments(self.__bin_ids, self.__axis.n_bins)
+        n_entries = order.size
+        sorted_values = np.empty(n_columns * n_entries, dtype=self.__y.dtype)
+        if self.__weights is None:
+            grouped_weights = sorted_weights = None
+        else:
+            grouped_weights = self.__weights[order]
+            sorted_weights = np.empty(n_columns * n_entries, dtype=grouped_weights.dtype)
+
+        for idx, column in enumerate(self.__y):
+            start, stop = idx * n_entries, (idx + 1) * n_entries
+            np.take(column, order, out=sorted_values[start:stop])
+            if grouped_weights is None:
+                sort_within_segments(sorted_values[start:stop], bin_offsets)
+            else:
+                sorted_weights[start:stop] = grouped_weights
+                sort_within_segments(
+                    sorted_values[start:stop], bin_offsets, sorted_weights[start:stop]
+                )
+
+        # The segments of each column follow the ones of the previous columns
+        offsets = np.append(
+            (np.arange(n_columns)[:, np.newaxis] * n_entries + bin_offsets[:-1]).ravel(),
+            n_columns * n_entries,
+        )
+
+        return sorted_values, offsets, sorted_weights
+
+    def __column_index(self, name):
+        try:
+            return self.__names.index(name)
+        except ValueError:
+            raise ValueError(f"Unknown column '{name}'!") from None
+
+    @property
+    def names(self):
+        """Return the column names (indices for a 2D y array)."""
+        return list(self.__names)
+
+    @property
+    def bin_axis(self):
+        """Return the axis of the x bins."""
+        return self.__axis
+
+    @property
+    def bin_centers(self):
+        """Return the centers for the x bins."""
+        return self.__axis.centers
+
+    @property
+    def bin_edges(self):
+        """Return the edges for the x bins."""
+        return self.__axis.edges
+
+    @property
+    def bin_counts(self):
+        """Return the number of entries for each x bin (the same for all columns)."""
+        return bin_counts(self.__bin_ids, self.__axis.n_bins)
+
+    def add_to_axis(self, ax, name, *configs: Profile2dPlotConfig):
+        """Add the profile of column 'name' to the given axis."""
+        idx = self.__column_index(name)
+
+        def statistic(quantity, *args):
+            return self.statistic(quantity, *args)[:, idx]
+
+        add_profile2d_configs_to_axis(ax, self.bin_centers, statistic, *configs)
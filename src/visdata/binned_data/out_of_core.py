@@ -0,0 +1,162 @@
+import os
+
+import numpy as np
+
+from .binning import BinAxis
+from .segments import bin_moments, bin_sums, merge_moments, moments_statistics
+from .sharing import chunk_bounds
+from .sketch import QuantileSketch
+
+# Estimated temporary memory per entry while binning a window (indices, masks)
+_OVERHEAD_PER_ENTRY = 64
+# Copies of the sketch buckets alive while a window is merged into them
+_SKETCH_COPIES = 4
+
+
+def load_columns(path, *columns):
+    """Return the columns stored at 'path' as memory-mapped arrays.
+
+    'path' is either a directory with one '<column>.npy' file per column or a
+    '.npy' file of a structured array with the columns as fields.
+    """
+    if os.path.isdir(path):
+        return tuple(
+            np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+            for column in columns
+        )
+
+    data = np.load(path, mmap_mode="r")
+
+    return tuple(data[column] for column in columns)
+
+
+def window_bounds(max_memory, *arrays):
+    """Return the (start, stop) bounds of windows over the arrays.
+
+    The windows are chosen so that the data of one window plus the
+    temporary arrays needed for binning it take at most 'max_memory' bytes.
+    Without 'max_memory' there is a single window. None entries are ignored.
+    """
+    arrays = [array for array in arrays if array is not None]
+    size = len(arrays[0])
+    if max_memory is None:
+        return [(0, size)]
+
+    entry_bytes = sum(array.dtype.itemsize for array in arrays) + _OVERHEAD_PER_ENTRY
+    window_size = max(int(max_memory // entry_bytes), 1)
+
+    return chunk_bounds(size, window_size) or [(0, size)]
+
+
+def windowed_bin_axis(data, bins, max_memory):
+    """Return the BinAxis for the data like 'BinAxis.from_data'.
+
+    For a number of bins the range is scanned window by window. Bin edge
+    estimators (e.g. 'auto') need all data at once.
+    """
+    if max_memory is None or isinstance(bins, (str, BinAxis)) or np.ndim(bins):
+        return BinAxis.from_data(data, bins)
+
+    # The extremes of all windows have the same range as the data
+    extremes = [
+        (window.min(), window.max())
+        for window in (data[start:stop] for start, stop in window_bounds(max_memory, data))
+        if window.size
+    ]
+
+    return BinAxis(np.histogram_bin_edges(np.array(extremes, dtype=data.dtype), bins))
+
+
+def windowed_bin_indices(index, n_bins, max_memory, *arrays):
+    """Return the bin index 'index(*windows)' of each entry window by window.
+
+    The indices (-1 if outside) are stored with the smallest integer type for
+    the number of bins.
+    """
+    if max_memory is None:
+        return index(*arrays)
+
+    # The indices plus one (see 'sort_segments') have to fit as well
+    bin_ids = np.empty(len(arrays[0]), dtype=np.min_scalar_type(-(n_bins + 2)))
+    for start, stop in window_bounds(max_memory, *arrays):
+        bin_ids[start:stop] = index(*(array[start:stop] for array in arrays))
+
+    return bin_ids
+
+
+def windowed_unique(data, max_memory):
+    """Return the sorted unique values of the data found window by window."""
+    return np.unique(
+        np.concatenate(
+            [np.unique(data[start:stop]) for start, stop in window_bounds(max_memory, data)]
+        )
+    )
+
+
+def windowed_sketch(bin_ids, values, n_bins, max_memory, weights=None, relative_accuracy=0.01):
+    """Return the QuantileSketch of the values in each bin filled window by window.
+
+    Half of 'max_memory' is used for the windows and half for the sketch
+    including the copies made while adding a window. Raise a ValueError if
+    the sketch does not fit, e.g. if there are few entries per bin.
+    """
+    sketch = QuantileSketch(n_bins, relative_accuracy=relative_accuracy)
+    for start, stop in window_bounds(max_memory // 2, values, weights):
+        sketch.add(
+            bin_ids[start:stop],
+            values[start:stop],
+            weights=None if weights is None else weights[start:stop],
+        )
+        if _SKETCH_COPIES * sketch.nbytes > max_memory // 2:
+            raise ValueError(
+                f"The quantile sketch of {n_bins} bins exceeds 'max_memory' ({max_memory} bytes)!"
+            )
+
+    return sketch
+
+
+def windowed_moments(bin_ids, values, n_bins, max_memory, weights=None):
+    """Return the means, stds, sems and effective counts of each bin.
+
+    The (weighted) moments are reduced window by window and merged, no
+    sorting needed.
+    """
+    moments = None
+    sum_weights2 = None if weights is None else np.zeros(n_bins)
+    for start, stop in window_bounds(max_memory, values, weights):
+        window_ids = bin_ids[start:stop]
+        window_weights = None if weights is None else weights[start:stop]
+        window_moments = bin_moments(
+            window_ids, values[start:stop], n_bins, weights=window_weights
+        )
+        if moments is None:
+            moments = window_moments
+        else:
+            moments = merge_moments(moments, window_moments)
+        if weights is not None:
+            sum_weights2 += bin_sums(window_ids, window_weights**2, n_bins)
+
+    counts, means, m2 = moments
+    if weights is None:
+        effective_counts = counts
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            effective_counts = counts**2 / sum_weights2
+
+    return (
+        *moments_statistics(counts, means, m2, sum_weights2=sum_weights2),
+        effective_counts,
+    )
+
+
+def sorting_fits(max_memory, values, weights=None):
+    """Return whether sorting the values (and weights) fits into 'max_memory'."""
+    if max_memory is None:
+        return True
+
+    # Sorted copies of the values and the weights and the sort permutation
+    item_size = values.itemsize + np.dtype(np.intp).itemsize
+    if weights is not None:
+        item_size += weights.itemsize
+
+    return values.size * item_size <= max_memory
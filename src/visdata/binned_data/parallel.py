@@ -0,0 +1,61 @@
+import operator
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .binning import BinAxis
+from .sharing import SharedArrays, attach_shared_arrays, reduce_chunks, shared_array
+from .streaming import Profile2dAccumulator
+
+
+def _fill_profile2d_chunk(start, stop, axis, quantile_accuracy):
+    """Profile one chunk of the shared x and y data."""
+    profile = Profile2dAccumulator(axis, quantile_accuracy)
+
+    return profile.fill(shared_array("x")[start:stop], shared_array("y")[start:stop])
+
+
+def parallel_profile2d(
+    x, y, bins=10, n_workers=None, chunk_size=2**20, quantile_accuracy=0.01
+):
+    """Calculate the profile for a 2d data problem in worker processes.
+
+    The data is split into chunks of 'chunk_size' which are profiled by
+    'n_workers' processes (default: all available CPUs) reading from shared
+    memory. The partial profiles are merged in chunk order as they arrive
+    (at most two per worker are kept at once), thus means, standard
+    deviations and standard errors are bit-for-bit identical for any number
+    of workers. Medians and quantiles are estimated from quantile
+    sketches with the relative accuracy 'quantile_accuracy', merging them is
+    exact as well. Return a Profile2dAccumulator.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.shape != y.shape:
+        raise ValueError(f"Shapes of x {x.shape} and y {y.shape} do not match!")
+    if n_workers is None:
+        n_workers = os.process_cpu_count()
+
+    axis = BinAxis.from_data(x, bins)
+
+    if n_workers == 1:
+        def fill_chunk(start, stop):
+            profile = Profile2dAccumulator(axis, quantile_accuracy)
+            return profile.fill(x[start:stop], y[start:stop])
+
+        return reduce_chunks(fill_chunk, operator.add, x.size, chunk_size)
+
+    with SharedArrays(x=x, y=y) as shared:
+        with ProcessPoolExecutor(
+            n_workers, initializer=attach_shared_arrays, initargs=(shared.specs,)
+        ) as pool:
+            return reduce_chunks(
+                partial(_fill_profile2d_chunk, axis=axis, quantile_accuracy=quantile_accuracy),
+                operator.add,
+                x.size,
+                chunk_size,
+                n_threads=n_workers,
+                pool=pool,
+            )
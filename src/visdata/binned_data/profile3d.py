@@ -0,0 +1,143 @@
+import numpy as np
+
+from .binning import xy_bins
+from .out_of_core import (
+    sorting_fits,
+    window_bounds,
+    windowed_bin_axis,
+    windowed_bin_indices,
+    windowed_moments,
+    windowed_sketch,
+)
+from .segment_statistics import SegmentStatistics
+from .segments import bin_counts, sort_segments
+
+
+class Profile3d(SegmentStatistics):
+
+    def __init__(
+        self, x, y, z, bins=10, weights=None, max_memory=None, quantile_accuracy=0.01
+    ):
+        """Calculate the profile of z over the (x, y) bins (optionally weighted).
+
+        'bins' are 'np.histogram2d' style bins. Each entry gets one flat index
+        'x_index * n_y_bins + y_index' of its cell, the moments are reduced
+        by cell without sorting and the data is sorted once by cell and value
+        for the medians and quantiles. Statistics have the shape
+        (n_x_bins, n_y_bins), empty cells yield nan. With 'max_memory' (in
+        bytes) the indices and moments are computed in windows and medians
+        and quantiles may come from a sketch, see 'Profile2d'.
+        """
+        x = np.asarray(x)
+        self.__z = np.asarray(z)
+        y = np.asarray(y)
+        if not x.shape == y.shape == self.__z.shape:
+            raise ValueError(
+                f"Shapes of x {x.shape}, y {y.shape} and z {self.__z.shape} do not match!"
+            )
+        if weights is None:
+            self.__weights = None
+        else:
+            self.__weights = np.asarray(weights)
+            if self.__weights.shape != self.__z.shape:
+                raise ValueError(
+                    f"Shapes of weights {self.__weights.shape} and z {self.__z.shape} do not match!"
+                )
+        self.__max_memory = max_memory
+        self.__quantile_accuracy = quantile_accuracy
+
+        bins_x, bins_y = xy_bins(bins)
+        self.__x_axis = windowed_bin_axis(x, bins_x, max_memory)
+        self.__y_axis = windowed_bin_axis(y, bins_y, max_memory)
+        self.__shape = (self.__x_axis.n_bins, self.__y_axis.n_bins)
+        self.__n_cells = self.__shape[0] * self.__shape[1]
+
+        def cell_index(x_data, y_data):
+            x_ids = self.__x_axis.index(x_data)
+            y_ids = self.__y_axis.index(y_data)
+            return np.where(
+                (x_ids >= 0) & (y_ids >= 0), x_ids * self.__shape[1] + y_ids, -1
+            )
+
+        self.__cell_ids = windowed_bin_indices(
+            cell_index, self.__n_cells, max_memory, x, y
+        )
+
+        self.__sketch = None
+        super().__init__()
+
+    def _shape_results(self, values):
+        """Return results of all cells as (n_x_bins, n_y_bins, ...)."""
+        return values.reshape(*self.__shape, *values.shape[1:])
+
+    def _compute_moments(self):
+        """Return the (weighted) moments of all cells window by window."""
+        return windowed_moments(
+            self.__cell_ids,
+            self.__z,
+            self.__n_cells,
+            self.__max_memory,
+            weights=self.__weights,
+        )
+
+    def _sorting_fits(self):
+        """Return whether sorting all z data fits into 'max_memory'."""
+        return sorting_fits(self.__max_memory, self.__z, self.__weights)
+
+    def _sketch_quantiles(self, q):
+        """Return the quantiles 'q' of all cells from a sketch filled window by window."""
+        if self.__sketch is None:
+            self.__sketch = windowed_sketch(
+                self.__cell_ids,
+                self.__z,
+                self.__n_cells,
+                self.__max_memory,
+                weights=self.__weights,
+                relative_accuracy=self.__quantile_accuracy,
+            )
+
+        return self.__sketch.quantiles(q)
+
+    def _sort_segments(self):
+        """Return the data sorted by cell and value."""
+        if not self._sorting_fits():
+            raise ValueError(
+                "Sorting all z data for robust statistics exceeds "
+                f"'max_memory' ({self.__max_memory} bytes)!"
+            )
+
+        return sort_segments(
+            self.__cell_ids, self.__z, self.__n_cells, weights=self.__weights
+        )
+
+    @property
+    def x_axis(self):
+        """Return the axis of the x bins."""
+        return self.__x_axis
+
+    @property
+    def y_axis(self):
+        """Return the axis of the y bins."""
+        return self.__y_axis
+
+    @property
+    def bin_counts(self):
+        """Return the number of entries for each cell."""
+        counts = sum(
+            bin_counts(self.__cell_ids[start:stop], self.__n_cells)
+            for start, stop in window_bounds(self.__max_memory, self.__z, self.__weights)
+        )
+
+        return counts.reshape(self.__shape)
+
+    def add_to_axis(self, ax, quantity="mean", **kwargs):
+        """Draw a statistic as colour map, keywords are passed to 'ax.pcolormesh'.
+
+        Quantities with parameters are given as tuple, e.g. ('trimmed_mean', 0.2).
+        Return the QuadMesh, e.g. for a colorbar.
+        """
+        if isinstance(quantity, str):
+            quantity = (quantity,)
+        values = self.statistic(*quantity)
+
+        return ax.pcolormesh(self.__x_axis.edges, self.__y_axis.edges, values.T, **kwargs)
@@ -0,0 +1,60 @@
+from .binning import xy_bins
+
+
+class CountsPyramid:
+
+    def __init__(self, binned_counts, min_bins=16):
+        """Counts of a 2D histogram at successively halved resolutions.
+
+        The first level are the given BinnedCounts2d, each further level
+        merges two neighbouring bins of the previous one along every axis
+        with more than 'min_bins' bins. All levels together need at most
+        about 4/3 of the memory of the first one and are built once, i.e.
+        zooming only selects a level and slices it. The coarser levels are
+        rebuilt when the given counts are filled.
+        """
+        self.__counts = binned_counts
+        self.__min_bins = min_bins
+        self.__levels = None
+        self.__version = None
+
+    @property
+    def levels(self):
+        """Return the counts of all levels, finest first."""
+        if self.__version != self.__counts.version:
+            self.__version = self.__counts.version
+            levels = [self.__counts]
+            while True:
+                counts = levels[-1]
+                x_factor = 2 if counts.x_axis.n_bins > self.__min_bins else None
+                y_factor = 2 if counts.y_axis.n_bins > self.__min_bins else None
+                if x_factor is None and y_factor is None:
+                    break
+                levels.append(counts.rebin(x=x_factor, y=y_factor))
+            self.__levels = tuple(levels)
+
+        return self.__levels
+
+    def level_index(self, x_range=None, y_range=None, max_bins=1000):
+        """Return the index of the finest level with at most 'max_bins' bins in the view.
+
+        The view is given by the (low, high) 'x_range' and 'y_range' (the
+        full range if None), 'max_bins' is a number or an (x, y) pair, e.g.
+        the size of the axes in pixels. The coarsest level is returned if
+        no level is coarse enough.
+        """
+        max_x_bins, max_y_bins = xy_bins(max_bins)
+        levels = self.levels
+        for index, counts in enumerate(levels):
+            n_x_bins = counts.x_axis.range_indices(*(x_range or (None, None))).size - 1
+            n_y_bins = counts.y_axis.range_indices(*(y_range or (None, None))).size - 1
+            if n_x_bins <= max_x_bins and n_y_bins <= max_y_bins:
+                return index
+
+        return len(levels) - 1
+
+    def select(self, x_range=None, y_range=None, max_bins=1000):
+        """Return the counts of the view at the resolution of 'level_index'."""
+        counts = self.levels[self.level_index(x_range, y_range, max_bins)]
+
+        return counts.slice(x=x_range, y=y_range)
@@ -0,0 +1,200 @@
+import numpy as np
+
+from .bootstrap import bootstrap_errors
+from .segments import segment_medians, segment_quantiles, segment_statistic
+
+
+class SegmentStatistics:
+
+    def __init__(self):
+        """Statistics of data reduced by segment, calculated on first use.
+
+        The base of the profiles: subclasses provide the moments of all
+        segments ('_compute_moments'), the data sorted once by segment and
+        value ('_sort_segments') and the shape of the results
+        ('_shape_results'). If the sorting does not fit ('_sorting_fits'),
+        medians and quantiles are estimated ('_sketch_quantiles').
+        """
+        self.__moments = None
+        self.__layout = None
+        self.__medians = None
+        self.__quantiles = {}
+        self.__statistics = {}
+        self.configure_bootstrap()
+
+    def _compute_moments(self):
+        """Return the means, stds, sems and effective counts of all segments."""
+        raise NotImplementedError
+
+    def _sort_segments(self):
+        """Return the sorted values, offsets and sorted weights, see 'sort_segments'."""
+        raise NotImplementedError
+
+    def _shape_results(self, values):
+        """Return the results of all segments in the shape of the statistics."""
+        return values
+
+    def _sorting_fits(self):
+        """Return whether the data may be sorted for medians and quantiles."""
+        return True
+
+    def _sketch_quantiles(self, q):
+        """Return the estimated quantiles 'q' of all segments."""
+        raise NotImplementedError
+
+    def _get_layout(self):
+        """Return the data sorted by segment and value, sort only once."""
+        if self.__layout is None:
+            self.__layout = self._sort_segments()
+
+        return self.__layout
+
+    def __get_moments(self):
+        """Return the (weighted) moments of all segments, no sorting needed."""
+        if self.__moments is None:
+            self.__moments = tuple(
+                self._shape_results(values) for values in self._compute_moments()
+            )
+
+        return self.__moments
+
+    @property
+    def bin_effective_counts(self):
+        """Return the effective number of entries for each bin."""
+        return self.__get_moments()[3]
+
+    @property
+    def bin_means(self):
+        """Return the means for each bin."""
+        return self.__get_moments()[0]
+
+    @property
+    def bin_medians(self):
+        """Return the medians for each bin."""
+        if self.__medians is None:
+            if self._sorting_fits():
+                sorted_values, offsets, sorted_weights = self._get_layout()
+                medians = segment_medians(sorted_values, offsets, weights=sorted_weights)
+            else:
+                medians = self._sketch_quantiles(0.5)
+            self.__medians = self._shape_results(medians)
+
+        return self.__medians
+
+    @property
+    def bin_stds(self):
+        """Return the standard deviations for each bin."""
+        return self.__get_moments()[1]
+
+    @property
+    def bin_sems(self):
+        """Return the standard error of the mean for each bin."""
+        return self.__get_moments()[2]
+
+    def bin_quantiles(self, q):
+        """Return the quantiles 'q' for each bin, shape (..., len(q)).
+
+        All quantiles are taken from the data sorted once, with weights they
+        are weighted like the medians. They are estimated if the sorting does
+        not fit.
+        """
+        key = tuple(np.atleast_1d(q))
+        if key not in self.__quantiles:
+            if self._sorting_fits():
+                sorted_values, offsets, sorted_weights = self._get_layout()
+                quantiles = segment_quantiles(
+                    sorted_values, offsets, key, weights=sorted_weights
+                )
+            else:
+                quantiles = self._sketch_quantiles(key)
+            self.__quantiles[key] = self._shape_results(quantiles)
+        quantiles = self.__quantiles[key]
+
+        return quantiles if np.ndim(q) else quantiles[..., 0]
+
+    def __segment_statistic(self, name, *args):
+        """Return a statistic of the sorted data (see 'segment_statistic')."""
+        key = (name, *args)
+        if key not in self.__statistics:
+            sorted_values, offsets, sorted_weights = self._get_layout()
+            self.__statistics[key] = self._shape_results(
+                segment_statistic(name, sorted_values, offsets, *args, weights=sorted_weights)
+            )
+
+        return self.__statistics[key]
+
+    @property
+    def bin_mads(self):
+        """Return the median absolute deviation from the median for each bin."""
+        return self.__segment_statistic("mad")
+
+    @property
+    def bin_iqrs(self):
+        """Return the interquartile range for each bin."""
+        return self.__segment_statistic("iqr")
+
+    def bin_trimmed_means(self, proportion=0.1):
+        """Return the means without the fraction 'proportion' at both ends for each bin."""
+        return self.__segment_statistic("trimmed_mean", proportion)
+
+    def bin_winsorized_means(self, proportion=0.1):
+        """Return the means with the fraction 'proportion' at both ends clipped for each bin."""
+        return self.__segment_statistic("winsorized_mean", proportion)
+
+    def configure_bootstrap(self, n_resamples=200, seed=None, n_workers=1):
+        """Configure the bootstrap errors, see 'bin_bootstrap_errors'."""
+        self.__bootstrap_options = {
+            "n_resamples": n_resamples,
+            "seed": seed,
+            "n_workers": n_workers,
+        }
+        self.__bootstrap_errors = {}
+
+    def bin_bootstrap_errors(self, quantity="median", *args):
+        """Return the bootstrap standard error of a statistic for each bin.
+
+        All bins are resampled at once for each of the 'n_resamples' resamples.
+        With a 'seed' the errors are reproducible, independent of the number of
+        worker processes 'n_workers' (see 'configure_bootstrap').
+        """
+        key = (quantity, *(tuple(np.atleast_1d(arg)) for arg in args))
+        if key not in self.__bootstrap_errors:
+            sorted_values, offsets, sorted_weights = self._get_layout()
+            self.__bootstrap_errors[key] = self._shape_results(
+                bootstrap_errors(
+                    sorted_values,
+                    offsets,
+                    quantity,
+                    *args,
+                    weights=sorted_weights,
+                    **self.__bootstrap_options,
+                )
+            )
+
+        return self.__bootstrap_errors[key]
+
+    def statistic(self, name, *args):
+        """Return the statistic 'name' for each bin (computed on first use)."""
+        match name:
+            case "mean":
+                return self.bin_means
+            case "median":
+                return self.bin_medians
+            case "std":
+                return self.bin_stds
+            case "sem":
+                return self.bin_sems
+            case "quantiles":
+                return self.bin_quantiles(*args)
+            case "mad":
+                return self.bin_mads
+            case "iqr":
+                return self.bin_iqrs
+            case "trimmed_mean":
+                return self.bin_trimmed_means(*args)
+            case "winsorized_mean":
+                return self.bin_winsorized_means(*args)
+            case "bootstrap":
+                return self.bin_bootstrap_errors(*args)
+            case _:
+                raise ValueError(f"Unknown quantity '{name}'!")
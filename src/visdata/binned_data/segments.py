@@ -0,0 +1,572 @@
+import numpy as np
+
+# Up to this many segments 'sort_segments' sorts each segment separately
+_MAX_SORTED_SEGMENTS = 4096
+
+
+def _segment_keys(bin_ids, n_bins):
+    """Return the bin ids plus one as small keys, the number of dropped entries and the offsets."""
+    # Out of range values have negative ids and are sorted to the front
+    keys = (np.asarray(bin_ids) + 1).astype(np.min_scalar_type(n_bins))
+    counts = np.bincount(keys, minlength=n_bins + 1)
+
+    offsets = np.zeros(n_bins + 1, dtype=np.intp)
+    np.cumsum(counts[1:], out=offsets[1:])
+
+    return keys, counts[0], offsets
+
+
+def group_segments(bin_ids, n_bins):
+    """Return the order grouping the entries by bin and the offsets.
+
+    Entries with a negative bin id are dropped. The order is a stable radix
+    sort of the small integer keys, e.g. to group several value arrays with
+    the same bins and sort them with 'sort_within_segments'.
+    """
+    keys, n_dropped, offsets = _segment_keys(bin_ids, n_bins)
+
+    return np.argsort(keys, kind="stable")[n_dropped:], offsets
+
+
+def sort_within_segments(grouped_values, offsets, weights=None):
+    """Sort the values grouped by segment within each segment in place.
+
+    The weights (if given) are reordered alike.
+    """
+    n_segments = offsets.size - 1
+    if n_segments > _MAX_SORTED_SEGMENTS:
+        # Sort by value, then stable by segment (a radix sort of the small ids)
+        order = np.argsort(grouped_values)
+        ids = np.repeat(
+            np.arange(n_segments, dtype=np.min_scalar_type(n_segments)),
+            segment_counts(offsets),
+        )
+        permutation = np.argsort(ids[order], kind="stable")
+        del ids
+        order = np.take(order, permutation, out=permutation, mode="clip")
+        grouped_values[:] = grouped_values[order]
+        if weights is not None:
+            weights[:] = weights[order]
+        return
+
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        if stop - start < 2:
+            continue
+        if weights is None:
+            grouped_values[start:stop].sort()
+        else:
+            within = np.argsort(grouped_values[start:stop])
+            grouped_values[start:stop] = grouped_values[start:stop][within]
+            weights[start:stop] = weights[start:stop][within]
+
+
+def sort_segments(bin_ids, values, n_bins, weights=None):
+    """Sort the values by bin and within each bin in a single pass.
+
+    Values with a negative bin id are dropped. Return the sorted values, the
+    offsets and the weights in the same order (None without weights), i.e.
+    the values of bin 'idx' are 'sorted_values[offsets[idx]:offsets[idx + 1]]'.
+    """
+    values = np.asarray(values)
+
+    if n_bins > _MAX_SORTED_SEGMENTS:
+        # Like 'np.lexsort((values, bin_ids))' but the stable sort of the small
+        # integer keys is a radix sort, which makes it several times faster
+        keys, n_dropped, offsets = _segment_keys(bin_ids, n_bins)
+        order = np.argsort(values)
+        permutation = np.argsort(keys[order], kind="stable")
+        del keys
+        # Compose both permutations in place, only two index arrays are alive
+        order = np.take(order, permutation, out=permutation, mode="clip")[n_dropped:]
+        if weights is not None:
+            weights = np.asarray(weights)[order]
+        return values[order], offsets, weights
+
+    # Group by bin, then sort each bin in place, i.e. only one index array is
+    # alive while gathering the values
+    order, offsets = group_segments(bin_ids, n_bins)
+    sorted_values = values[order]
+    if weights is not None:
+        weights = np.asarray(weights)[order]
+    del order
+    sort_within_segments(sorted_values, offsets, weights)
+
+    return sorted_values, offsets, weights
+
+
+class BinnedData:
+
+    def __init__(self, values, offsets):
+        """Data of consecutive bins stored in one buffer (CSR-like).
+
+        The values of bin 'idx' are 'values[offsets[idx]:offsets[idx + 1]]',
+        indexing returns this slice as a view without copying. Slicing returns
+        a list of these views.
+        """
+        self.__values = values
+        self.__offsets = offsets
+
+    def __len__(self):
+        return self.__offsets.size - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[jdx] for jdx in range(*idx.indices(len(self)))]
+
+        n_bins = len(self)
+        if not -n_bins <= idx < n_bins:
+            raise IndexError(f"Bin index {idx} out of range for {n_bins} bins!")
+        idx %= n_bins
+
+        return self.__values[self.__offsets[idx]:self.__offsets[idx + 1]]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def values(self):
+        """Return the buffer with the data of all bins."""
+        return self.__values
+
+    @property
+    def offsets(self):
+        """Return the offsets of the bins in the buffer."""
+        return self.__offsets
+
+    @property
+    def counts(self):
+        """Return the number of entries for each bin."""
+        return segment_counts(self.__offsets)
+
+
+def segment_counts(offsets):
+    """Return the number of entries for each segment."""
+    return np.diff(offsets)
+
+
+def segment_sums(values, offsets):
+    """Return the sum for each segment (0 for empty segments)."""
+    counts = segment_counts(offsets)
+    filled = counts > 0
+    sums = np.zeros((counts.size, *np.shape(values)[1:]), dtype=np.float64)
+    if np.any(filled):
+        # Starting only at filled segments, empty segments have zero length
+        sums[filled] = np.add.reduceat(values, offsets[:-1][filled], axis=0)
+
+    return sums
+
+
+def segment_effective_counts(offsets, weights=None):
+    """Return the (Kish) effective number of entries for each segment.
+
+    This is 'sum(w)^2 / sum(w^2)', i.e. the number of entries without weights.
+    """
+    if weights is None:
+        return segment_counts(offsets)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return segment_sums(weights, offsets) ** 2 / segment_sums(weights**2, offsets)
+
+
+def segment_means(values, offsets, weights=None):
+    """Return the (weighted) mean for each segment (nan for empty segments)."""
+    if weights is None:
+        sums, norms = segment_sums(values, offsets), segment_counts(offsets)
+    else:
+        sums, norms = segment_sums(weights * values, offsets), segment_sums(weights, offsets)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / norms
+
+    return means
+
+
+def segment_stds(values, offsets, means=None, ddof=1, weights=None):
+    """Return the standard deviation for each segment (two-pass algorithm).
+
+    Segments with less than 'ddof + 1' entries yield nan. With weights the
+    unbiased estimate for reliability weights is returned, it equals the one
+    for 'ddof=1' if all weights are 1.
+    """
+    counts = segment_counts(offsets)
+    if means is None:
+        means = segment_means(values, offsets, weights=weights)
+
+    deviations = values - np.repeat(means, counts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if weights is None:
+            squares = segment_sums(deviations**2, offsets)
+            variances = np.where(counts > ddof, squares / (counts - ddof), np.nan)
+        else:
+            squares = segment_sums(weights * deviations**2, offsets)
+            sum_weights = segment_sums(weights, offsets)
+            norms = sum_weights - segment_sums(weights**2, offsets) / sum_weights
+            variances = np.where(norms > 0, squares / norms, np.nan)
+
+    return np.sqrt(variances)
+
+
+def segment_sems(values, offsets, stds=None, weights=None):
+    """Return the standard error on the mean for each segment.
+
+    With weights the effective number of entries is used.
+    """
+    if stds is None:
+        stds = segment_stds(values, offsets, weights=weights)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sems = stds / np.sqrt(segment_effective_counts(offsets, weights))
+
+    return sems
+
+
+def segment_medians(sorted_values, offsets, weights=None):
+    """Return the median for each segment of values sorted within segments.
+
+    Empty segments and segments containing nan yield nan like 'np.median'.
+    The weighted median is the weighted quantile 0.5 (see 'segment_quantiles'),
+    i.e. equal to the unweighted median if all weights are 1. Segments with
+    negative weights yield nan.
+    """
+    if weights is not None:
+        return _segment_weighted_quantiles(sorted_values, offsets, 0.5, weights)
+
+    counts = segment_counts(offsets)
+    filled = counts > 0
+    starts = offsets[:-1][filled]
+    counts = counts[filled]
+
+    lower = sorted_values[starts + (counts - 1) // 2]
+    upper = sorted_values[starts + counts // 2]
+
+    medians = np.full(filled.size, np.nan)
+    medians[filled] = (lower + upper) / 2
+    # Sorting puts nan at the end of a segment
+    medians[filled] = np.where(
+        np.isnan(sorted_values[starts + counts - 1]), np.nan, medians[filled]
+    )
+
+    return medians
+
+
+def segment_quantiles(sorted_values, offsets, q, weights=None):
+    """Return the quantiles 'q' for each segment of values sorted within segments.
+
+    All quantiles are taken from the sorted values by index arithmetic, i.e.
+    no further sorting is needed. The quantiles are interpolated linearly like
+    'np.quantile'. With weights each value is placed at the cumulative weight
+    up to its center, the positions of the first and last value of a segment
+    are the quantiles 0 and 1, i.e. the result equals the unweighted one if
+    all weights are 1 and does not change if all weights are scaled (unlike
+    repeating entries by integer weights). The result has
+    the shape (n_segments,) for scalar 'q' and (n_segments, len(q)) otherwise,
+    empty segments and segments containing nan yield nan.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    if np.any((q < 0) | (q > 1)):
+        raise ValueError("Quantiles must be in [0, 1]!")
+    if weights is not None:
+        return _segment_weighted_quantiles(sorted_values, offsets, q, weights)
+
+    counts = segment_counts(offsets)
+    filled = counts > 0
+    starts = offsets[:-1][filled, np.newaxis]
+    counts = counts[filled, np.newaxis]
+
+    positions = (counts - 1) * np.atleast_1d(q)[np.newaxis, :]
+    lower = np.floor(positions).astype(np.intp)
+    fractions = positions - lower
+    upper = np.minimum(lower + 1, counts - 1)
+    lower_values = sorted_values[starts + lower]
+    upper_values = sorted_values[starts + upper]
+
+    quantiles = np.full((filled.size, positions.shape[1]), np.nan)
+    quantiles[filled] = lower_values + fractions * (upper_values - lower_values)
+    # Sorting puts nan at the end of a segment
+    quantiles[filled] = np.where(
+        np.isnan(sorted_values[starts + counts - 1]), np.nan, quantiles[filled]
+    )
+
+    return quantiles[:, 0] if q.ndim == 0 else quantiles
+
+
+def _segment_weighted_quantiles(sorted_values, offsets, q, weights):
+    q = np.asarray(q, dtype=np.float64)
+    counts = segment_counts(offsets)
+    filled = counts > 0
+    starts = offsets[:-1][filled, np.newaxis]
+    stops = offsets[1:][filled, np.newaxis]
+
+    # Cumulative weight up to the center of each entry, keep it monotonic
+    positive_weights = np.maximum(weights, 0)
+    centers = np.cumsum(positive_weights)
+    positive_weights *= 0.5
+    centers -= positive_weights
+    first, last = centers[starts], centers[stops - 1]
+    targets = first + (last - first) * np.atleast_1d(q)[np.newaxis, :]
+
+    # Interpolate between the last entry at or below the target and the next one
+    lower = np.clip(np.searchsorted(centers, targets, side="right") - 1, starts, stops - 1)
+    upper = np.minimum(lower + 1, stops - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fractions = np.clip((targets - centers[lower]) / (centers[upper] - centers[lower]), 0, 1)
+    fractions = np.where(upper > lower, fractions, 0)
+    lower_values, upper_values = sorted_values[lower], sorted_values[upper]
+
+    invalid = (
+        (segment_sums(weights < 0, offsets)[filled, np.newaxis] > 0)
+        | (segment_sums(positive_weights, offsets)[filled, np.newaxis] <= 0)
+        | np.isnan(sorted_values[stops - 1])
+    )
+    quantiles = np.full((filled.size, targets.shape[1]), np.nan)
+    quantiles[filled] = np.where(
+        invalid, np.nan, lower_values + fractions * (upper_values - lower_values)
+    )
+
+    return quantiles[:, 0] if q.ndim == 0 else quantiles
+
+
+def segment_ids(offsets):
+    """Return the segment index of each entry."""
+    return np.repeat(np.arange(offsets.size - 1), segment_counts(offsets))
+
+
+def _check_proportion(proportion):
+    if not 0 <= proportion < 0.5:
+        raise ValueError(f"Proportion to cut must be in [0, 0.5), got {proportion}!")
+
+
+def segment_mads(sorted_values, offsets, medians=None, weights=None):
+    """Return the median absolute deviation from the median for each segment.
+
+    The deviations are sorted within all segments at once. Multiply by 1.4826
+    to estimate the standard deviation of normally distributed values. Empty
+    segments and segments containing nan yield nan.
+    """
+    if medians is None:
+        medians = segment_medians(sorted_values, offsets, weights=weights)
+
+    deviations = np.abs(sorted_values - np.repeat(medians, segment_counts(offsets)))
+    deviations, _, weights = sort_segments(
+        segment_ids(offsets), deviations, offsets.size - 1, weights=weights
+    )
+
+    return segment_medians(deviations, offsets, weights=weights)
+
+
+def segment_iqrs(sorted_values, offsets, weights=None):
+    """Return the interquartile range for each segment (see 'segment_quantiles')."""
+    lower, upper = segment_quantiles(sorted_values, offsets, (0.25, 0.75), weights=weights).T
+
+    return upper - lower
+
+
+def _weighted_cuts(offsets, proportion, weights):
+    """Return the cumulative weights and where the cuts of each segment are.
+
+    The fraction 'int(proportion * n) / n' of the total weight is cut at both
+    ends, i.e. unit weights cut the same entries as no weights.
+    """
+    counts = segment_counts(offsets)
+    cumulative = np.zeros(weights.size + 1)
+    np.cumsum(np.maximum(weights, 0), out=cumulative[1:])
+    totals = cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cut_weights = (proportion * counts).astype(np.intp) * totals / counts
+    lower = cumulative[offsets[:-1]] + cut_weights
+    upper = cumulative[offsets[1:]] - cut_weights
+
+    return cumulative, lower, upper
+
+
+def segment_trimmed_means(sorted_values, offsets, proportion=0.1, weights=None):
+    """Return the mean for each segment without the lowest and highest values.
+
+    Without weights 'int(proportion * n)' values are cut from both ends like
+    'scipy.stats.trim_mean'. With weights the same fraction of the total
+    weight is cut, the entries at the cut only count with their remaining
+    weight, i.e. unit weights give the unweighted result. Empty segments and
+    segments containing nan yield nan.
+    """
+    _check_proportion(proportion)
+    counts = segment_counts(offsets)
+
+    if weights is None:
+        starts = np.repeat(offsets[:-1], counts)
+        cuts = np.repeat((proportion * counts).astype(np.intp), counts)
+        positions = np.arange(sorted_values.size) - starts
+        kept = ((positions >= cuts) & (positions < np.repeat(counts, counts) - cuts)).astype(
+            np.float64
+        )
+    else:
+        # Weight of each entry between the cumulative weights of both cuts
+        cumulative, lower, upper = _weighted_cuts(offsets, proportion, weights)
+        kept = np.clip(
+            np.minimum(cumulative[1:], np.repeat(upper, counts))
+            - np.maximum(cumulative[:-1], np.repeat(lower, counts)),
+            0,
+            None,
+        )
+
+    means = segment_means(np.where(kept > 0, sorted_values, 0), offsets, weights=kept)
+    if weights is not None:
+        means[segment_sums(weights < 0, offsets) > 0] = np.nan
+
+    return _nan_segments(means, sorted_values, offsets)
+
+
+def segment_winsorized_means(sorted_values, offsets, proportion=0.1, weights=None):
+    """Return the mean for each segment with the extreme values clipped.
+
+    Without weights the 'int(proportion * n)' lowest and highest values are
+    replaced by the closest remaining ones like 'scipy.stats.mstats.winsorize',
+    except that both cuts are rounded down (scipy rounds the upper one). With
+    weights the same fraction of the total weight is clipped to the values
+    at the cuts, i.e. unit weights give the unweighted result. Empty segments
+    and segments containing nan yield nan.
+    """
+    _check_proportion(proportion)
+    counts = segment_counts(offsets)
+    filled = counts > 0
+    starts, stops = offsets[:-1][filled], offsets[1:][filled]
+
+    if weights is None:
+        cuts = (proportion * counts[filled]).astype(np.intp)
+        lowest, highest = starts + cuts, stops - 1 - cuts
+    else:
+        # First entry reaching above the lower cut, last one starting below the upper cut
+        cumulative, lower, upper = _weighted_cuts(offsets, proportion, weights)
+        lowest = np.searchsorted(cumulative[1:], lower[filled], side="right")
+        highest = np.searchsorted(cumulative[:-1], upper[filled], side="left") - 1
+        lowest = np.clip(lowest, starts, stops - 1)
+        highest = np.clip(highest, starts, stops - 1)
+    limits = np.full((counts.size, 2), np.nan)
+    limits[filled, 0] = sorted_values[lowest]
+    limits[filled, 1] = sorted_values[highest]
+
+    clipped = np.clip(
+        sorted_values, np.repeat(limits[:, 0], counts), np.repeat(limits[:, 1], counts)
+    )
+    means = segment_means(clipped, offsets, weights=weights)
+    if weights is not None:
+        means[segment_sums(weights < 0, offsets) > 0] = np.nan
+
+    return _nan_segments(means, sorted_values, offsets)
+
+
+def _nan_segments(results, sorted_values, offsets):
+    """Set the results of segments containing nan to nan."""
+    filled = segment_counts(offsets) > 0
+    # Sorting puts nan at the end of a segment
+    results[filled] = np.where(
+        np.isnan(sorted_values[offsets[1:][filled] - 1]), np.nan, results[filled]
+    )
+
+    return results
+
+
+def segment_statistic(name, sorted_values, offsets, *args, weights=None):
+    """Return the statistic 'name' for each segment of values sorted within segments."""
+    match name:
+        case "mean":
+            return segment_means(sorted_values, offsets, weights=weights)
+        case "median":
+            return segment_medians(sorted_values, offsets, weights=weights)
+        case "std":
+            return segment_stds(sorted_values, offsets, weights=weights)
+        case "sem":
+            return segment_sems(sorted_values, offsets, weights=weights)
+        case "quantiles":
+            return segment_quantiles(sorted_values, offsets, *args, weights=weights)
+        case "mad":
+            return segment_mads(sorted_values, offsets, weights=weights)
+        case "iqr":
+            return segment_iqrs(sorted_values, offsets, weights=weights)
+        case "trimmed_mean":
+            return segment_trimmed_means(sorted_values, offsets, *args, weights=weights)
+        case "winsorized_mean":
+            return segment_winsorized_means(sorted_values, offsets, *args, weights=weights)
+        case _:
+            raise ValueError(f"Unknown quantity '{name}'!")
+
+
+def bin_counts(bin_ids, n_bins):
+    """Return the number of entries for each bin (negative bin ids are dropped)."""
+    return np.bincount(np.asarray(bin_ids) + 1, minlength=n_bins + 1)[1:]
+
+
+def bin_sums(bin_ids, values, n_bins):
+    """Return the sum of the values for each bin (negative bin ids are dropped)."""
+    bin_ids = np.asarray(bin_ids)
+    valid = bin_ids >= 0
+    if not np.all(valid):
+        bin_ids, values = bin_ids[valid], np.asarray(values)[valid]
+
+    return np.bincount(bin_ids, weights=values, minlength=n_bins)
+
+
+def bin_moments(bin_ids, values, n_bins, weights=None):
+    """Return count, mean and sum of squared deviations (M2) for each bin.
+
+    Values with a negative bin id are dropped. The mean of an empty bin is 0
+    so that the moments can be merged without special cases. With weights,
+    the sum of weights replaces the count and M2 is weighted.
+    """
+    bin_ids = np.asarray(bin_ids)
+    values = np.asarray(values)
+    valid = bin_ids >= 0
+    if not np.all(valid):
+        bin_ids, values = bin_ids[valid], values[valid]
+        if weights is not None:
+            weights = np.asarray(weights)[valid]
+
+    if weights is None:
+        counts = np.bincount(bin_ids, minlength=n_bins)
+        sums = np.bincount(bin_ids, weights=values, minlength=n_bins)
+    else:
+        counts = np.bincount(bin_ids, weights=weights, minlength=n_bins)
+        sums = np.bincount(bin_ids, weights=weights * values, minlength=n_bins)
+    means = np.divide(sums, counts, out=np.zeros(n_bins), where=counts != 0)
+
+    squares = (values - means[bin_ids]) ** 2
+    if weights is not None:
+        squares *= weights
+    m2 = np.bincount(bin_ids, weights=squares, minlength=n_bins)
+
+    return counts, means, m2
+
+
+def merge_moments(first, second):
+    """Merge two sets of (count, mean, M2) moments (Chan et al.)."""
+    counts_a, means_a, m2_a = first
+    counts_b, means_b, m2_b = second
+
+    counts = counts_a + counts_b
+    delta = means_b - means_a
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight_b = np.where(counts > 0, counts_b / counts, 0)
+    means = means_a + delta * weight_b
+    m2 = m2_a + m2_b + delta**2 * counts_a * weight_b
+
+    return counts, means, m2
+
+
+def moments_statistics(counts, means, m2, ddof=1, sum_weights2=None):
+    """Return mean, standard deviation and standard error from moments.
+
+    Empty bins yield nan, as do the deviations of bins with less than
+    'ddof + 1' entries. For weighted moments ('counts' is the sum of weights)
+    pass the sum of squared weights to get the same estimates as the
+    weighted segment reductions.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if sum_weights2 is None:
+            norms = np.where(counts > ddof, counts - ddof, 0)
+            effective_counts = counts
+        else:
+            norms = counts - sum_weights2 / counts
+            effective_counts = counts**2 / sum_weights2
+        means = np.where(counts != 0, means, np.nan)
+        stds = np.sqrt(np.where(norms > 0, m2 / norms, np.nan))
+        sems = stds / np.sqrt(effective_counts)
+
+    return means, stds, sems
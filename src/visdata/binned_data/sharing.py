@@ -0,0 +1,107 @@
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Arrays attached by the worker processes, name -> (shared memory, array)
+_shared_arrays = {}
+
+
+class SharedArrays:
+
+    def __init__(self, **arrays):
+        """Copy arrays once into shared memory to pass them to worker processes.
+
+        Use it as a context manager, the shared memory is released on exit.
+        Worker processes attach to the arrays with 'attach_shared_arrays'
+        using 'specs' and get them from 'shared_array'.
+        """
+        self.__memory = {}
+        self.__specs = {}
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            self.__memory[name] = memory
+            self.__specs[name] = (memory.name, array.shape, array.dtype.str)
+
+    @property
+    def specs(self):
+        return self.__specs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for memory in self.__memory.values():
+            memory.close()
+            memory.unlink()
+
+
+def attach_shared_arrays(specs):
+    """Attach to the arrays of a SharedArrays object (worker initializer)."""
+    for name, (memory_name, shape, dtype) in specs.items():
+        memory = shared_memory.SharedMemory(name=memory_name, track=False)
+        _shared_arrays[name] = (
+            memory,
+            np.ndarray(shape, dtype=dtype, buffer=memory.buf),
+        )
+
+
+def shared_array(name):
+    """Return an array attached by 'attach_shared_arrays'."""
+    return _shared_arrays[name][1]
+
+
+def chunk_bounds(size, chunk_size):
+    """Return the (start, stop) bounds of consecutive chunks."""
+    return [
+        (start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)
+    ]
+
+
+def reduce_chunks(func, combine, size, chunk_size, n_threads=1, pool=None):
+    """Return the results of 'func(start, stop)' for consecutive chunks combined.
+
+    The results are folded in chunk order with 'combine(total, result)' as
+    they arrive, i.e. the result does not depend on the number of threads
+    and at most two results per thread are kept at once. The chunks are
+    processed by 'n_threads' threads (default: all available CPUs), which
+    only run in parallel while 'func' releases the GIL, e.g. in NumPy
+    kernels. With an executor 'pool' (e.g. of worker processes) the chunks
+    are submitted to it instead, 'n_threads' is then its number of workers.
+    """
+    if n_threads is None:
+        n_threads = os.process_cpu_count()
+    bounds = iter(chunk_bounds(size, chunk_size) or [(0, size)])
+    if pool is not None:
+        return _fold_submitted(pool, func, combine, bounds, 2 * n_threads)
+    if n_threads == 1:
+        total = None
+        for start, stop in bounds:
+            result = func(start, stop)
+            total = result if total is None else combine(total, result)
+        return total
+
+    with ThreadPoolExecutor(n_threads) as pool:
+        return _fold_submitted(pool, func, combine, bounds, 2 * n_threads)
+
+
+def _fold_submitted(pool, func, combine, bounds, max_pending):
+    """Fold the results of the chunks in order, at most 'max_pending' are submitted."""
+    total = None
+    pending = deque(
+        pool.submit(func, start, stop)
+        for start, stop in itertools.islice(bounds, max_pending)
+    )
+    while pending:
+        result = pending.popleft().result()
+        # Submit the next chunk only when a result is consumed
+        for start, stop in itertools.islice(bounds, 1):
+            pending.append(pool.submit(func, start, stop))
+        total = result if total is None else combine(total, result)
+
+    return total
@@ -0,0 +1,275 @@
+import numpy as np
+
+# Buckets are counted densely if there are at most this many possible (bin, key)
+# codes per bucket, else they are sorted
+_DENSE_CODES_PER_BUCKET = 4
+
+
+class _BucketStore:
+    """Sparse bucket counts, only the filled (bin, key) buckets sorted by bin and key."""
+
+    def __init__(self, n_bins):
+        self.bins = np.zeros(0, dtype=np.min_scalar_type(max(n_bins - 1, 0)))
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.bins.nbytes + self.keys.nbytes + self.counts.nbytes
+
+    def copy(self):
+        store = _BucketStore(0)
+        store.bins = self.bins.copy()
+        store.keys = self.keys.copy()
+        store.counts = self.counts.copy()
+
+        return store
+
+    def add(self, bin_ids, keys, weights=None):
+        """Add the buckets of a window, only the filled buckets are stored."""
+        if keys.size == 0:
+            return
+        counts = (
+            np.ones(keys.size, dtype=np.int64)
+            if weights is None
+            else np.asarray(weights, dtype=np.float64)
+        )
+        self.__insert(bin_ids, keys, counts)
+
+    def __insert(self, bins, keys, counts):
+        """Insert buckets, the store is merged and sorted again."""
+        self.__store(
+            np.concatenate((self.bins, bins)),
+            np.concatenate((self.keys, keys)),
+            np.concatenate((self.counts, counts)),
+        )
+
+    def __store(self, bins, keys, counts):
+        """Store the buckets sorted by bin and key, summing equal buckets."""
+        if keys.size == 0:
+            return
+
+        # One integer code per bucket sorts by bin and key
+        low = keys.min()
+        width = keys.max() - low + 1
+        codes = bins.astype(np.int64)
+        codes *= width
+        codes += keys
+        codes -= low
+        del bins, keys
+
+        n_codes = int(codes.max()) + 1
+        if n_codes <= _DENSE_CODES_PER_BUCKET * codes.size:
+            # Few possible buckets, summing them densely needs no sort
+            sums = np.bincount(codes, weights=counts, minlength=n_codes)
+            codes = np.flatnonzero(sums)
+            counts = sums[codes].astype(counts.dtype)
+        else:
+            order = np.argsort(codes)
+            codes = codes[order]
+            counts = counts[order]
+            del order
+            # Sum equal buckets
+            first = np.ones(codes.size, dtype=bool)
+            np.not_equal(codes[1:], codes[:-1], out=first[1:])
+            starts = np.flatnonzero(first)
+            codes = codes[starts]
+            counts = np.add.reduceat(counts, starts)
+
+        self.bins = (codes // width).astype(self.bins.dtype)
+        self.keys = codes % width + low
+        self.counts = counts
+
+    def merge(self, other):
+        self.__insert(other.bins, other.keys, other.counts)
+
+    def collapse(self, max_buckets):
+        """Fold the lowest keys of each bin into one bucket to limit the memory."""
+        if self.keys.size == 0:
+            return
+        # The buckets are sorted by key within each bin, the last one is the highest
+        last = np.ones(self.bins.size, dtype=bool)
+        last[:-1] = self.bins[1:] != self.bins[:-1]
+        stops = np.flatnonzero(last)
+        highest = np.repeat(self.keys[stops], np.diff(stops, prepend=-1))
+        lowest = highest - (max_buckets - 1)
+        if np.any(self.keys < lowest):
+            self.__store(self.bins, np.maximum(self.keys, lowest), self.counts)
+
+
+class QuantileSketch:
+
+    def __init__(self, n_bins, relative_accuracy=0.01, max_buckets=2048):
+        """Mergeable quantile sketch for each of 'n_bins' bins (DDSketch).
+
+        Values are counted in logarithmic buckets, the estimated quantiles
+        have a relative error of at most 'relative_accuracy'. Only filled
+        buckets are stored, at most 'max_buckets' per sign and bin, if the
+        values of a bin span more buckets, its lowest absolute values lose
+        their accuracy guarantee. Weighted values count with their weight
+        (the counts become float64).
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(
+                f"Relative accuracy must be in (0, 1), got {relative_accuracy}!"
+            )
+        self.__n_bins = n_bins
+        self.__relative_accuracy = relative_accuracy
+        self.__max_buckets = max_buckets
+
+        self.__gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.__log_gamma = np.log(self.__gamma)
+        # Smaller absolute values are treated as zero
+        self.__min_value = np.finfo(np.float64).tiny * self.__gamma
+
+        self.__positive = _BucketStore(n_bins)
+        self.__negative = _BucketStore(n_bins)
+        self.__zeros = np.zeros(n_bins, dtype=np.int64)
+
+    @property
+    def n_bins(self):
+        return self.__n_bins
+
+    @property
+    def relative_accuracy(self):
+        return self.__relative_accuracy
+
+    @property
+    def counts(self):
+        """Return the number of values (sum of weights if weighted) for each bin."""
+        counts = self.__zeros.copy()
+        for store in (self.__positive, self.__negative):
+            counts = counts.astype(np.result_type(counts, store.counts), copy=False)
+            np.add.at(counts, store.bins, store.counts)
+
+        return counts
+
+    @property
+    def nbytes(self):
+        """Return the memory of the stored buckets in bytes."""
+        return self.__positive.nbytes + self.__negative.nbytes + self.__zeros.nbytes
+
+    def __key(self, values):
+        return np.ceil(np.log(values) / self.__log_gamma).astype(np.int64)
+
+    def __value(self, keys):
+        return 2 * self.__gamma ** keys.astype(np.float64) / (self.__gamma + 1)
+
+    def add(self, bin_ids, values, weights=None):
+        """Add (weighted) values to the given bins (negative bin ids are ignored)."""
+        bin_ids = np.asarray(bin_ids)
+        values = np.asarray(values, dtype=np.float64)
+        valid = (bin_ids >= 0) & ~np.isnan(values)
+        bin_ids, values = bin_ids[valid], values[valid]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)[valid]
+            self.__zeros = self.__zeros.astype(np.float64, copy=False)
+
+        def selected(mask):
+            return None if weights is None else weights[mask]
+
+        positive = values > self.__min_value
+        negative = values < -self.__min_value
+        zero = ~(positive | negative)
+
+        self.__positive.add(
+            bin_ids[positive], self.__key(values[positive]), selected(positive)
+        )
+        self.__negative.add(
+            bin_ids[negative], self.__key(-values[negative]), selected(negative)
+        )
+        self.__zeros += np.bincount(
+            bin_ids[zero], weights=selected(zero), minlength=self.__n_bins
+        ).astype(self.__zeros.dtype, copy=False)
+
+        self.__positive.collapse(self.__max_buckets)
+        self.__negative.collapse(self.__max_buckets)
+
+        return self
+
+    def merge(self, other):
+        """Return a new sketch combining this one and 'other'."""
+        if not isinstance(other, QuantileSketch):
+            raise TypeError(
+                f"Can't merge {self.__class__.__name__} with {type(other).__name__}!"
+            )
+        if (
+            self.__n_bins != other.__n_bins
+            or self.__relative_accuracy != other.__relative_accuracy
+        ):
+            raise ValueError("Can't merge sketches with different bins or accuracy!")
+
+        merged = QuantileSketch(
+            self.__n_bins, self.__relative_accuracy, self.__max_buckets
+        )
+        merged.__positive = self.__positive.copy()
+        merged.__positive.merge(other.__positive)
+        merged.__positive.collapse(self.__max_buckets)
+        merged.__negative = self.__negative.copy()
+        merged.__negative.merge(other.__negative)
+        merged.__negative.collapse(self.__max_buckets)
+        merged.__zeros = self.__zeros + other.__zeros
+
+        return merged
+
+    def __add__(self, other):
+        if not isinstance(other, QuantileSketch):
+            return NotImplemented
+
+        return self.merge(other)
+
+    def quantiles(self, q):
+        """Return the estimated quantiles 'q' for each bin (nan if empty).
+
+        With weights the bucket is taken where the cumulative weight reaches
+        the fraction 'q' of the total weight. The result has the shape
+        (n_bins,) for scalar 'q' and (n_bins, len(q)) otherwise.
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("Quantiles must be in [0, 1]!")
+
+        # Order the filled buckets of all bins from the most negative to the
+        # most positive value
+        zero_bins = np.flatnonzero(self.__zeros)
+        bins = np.concatenate((self.__negative.bins, zero_bins, self.__positive.bins))
+        values = np.concatenate(
+            (
+                -self.__value(self.__negative.keys),
+                np.zeros(zero_bins.size),
+                self.__value(self.__positive.keys),
+            )
+        )
+        counts = np.concatenate(
+            (self.__negative.counts, self.__zeros[zero_bins], self.__positive.counts)
+        )
+        filled = counts > 0
+        order = np.lexsort((values[filled], bins[filled]))
+        bins, values, counts = bins[filled][order], values[filled][order], counts[filled][order]
+
+        # Ranks of all bins in one cumulative sum, offset by the previous bins
+        cumulative = np.cumsum(counts)
+        starts = np.searchsorted(bins, np.arange(self.__n_bins), side="left")
+        stops = np.searchsorted(bins, np.arange(self.__n_bins), side="right")
+        before = np.concatenate(([0], cumulative))
+        totals = before[stops] - before[starts]
+
+        weighted = counts.dtype == np.float64
+        if weighted:
+            ranks = np.atleast_1d(q)[np.newaxis, :] * totals[:, np.newaxis]
+            # First bucket where the cumulative weight reaches the rank
+            side = "left"
+        else:
+            ranks = np.atleast_1d(q)[np.newaxis, :] * (totals[:, np.newaxis] - 1)
+            # Number of values up to the bucket must exceed the rank
+            side = "right"
+        positions = np.searchsorted(
+            cumulative, before[starts, np.newaxis] + ranks, side=side
+        )
+        positions = np.clip(positions, starts[:, np.newaxis], stops[:, np.newaxis] - 1)
+
+        result = np.full(positions.shape, np.nan)
+        filled = stops > starts
+        result[filled] = values[positions[filled]]
+
+        return result[:, 0] if q.ndim == 0 else result
@@ -0,0 +1,109 @@
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+# Version of the layout of the stored arrays, increase on incompatible changes
+SCHEMA_VERSION = 1
+
+# Size of the fixed part of a local file header in a zip archive
+_LOCAL_HEADER_SIZE = 30
+
+
+def _npz_path(path):
+    """Return the path with the '.npz' suffix which 'np.savez' appends."""
+    path = os.fspath(path)
+
+    return path if path.endswith(".npz") else f"{path}.npz"
+
+
+def save_arrays(path, kind, **arrays):
+    """Save binned results as uncompressed '.npz' with a versioned schema.
+
+    'kind' names the stored object (e.g. 'BinnedCounts2d'). The arrays are
+    stored uncompressed, thus they can be memory-mapped by 'load_arrays'.
+    The suffix '.npz' is appended to the path if missing.
+    """
+    arrays = {name: np.asarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Can't store array '{name}' of dtype object!")
+
+    np.savez(
+        _npz_path(path),
+        __kind__=np.array(kind),
+        __version__=np.array(SCHEMA_VERSION),
+        **arrays,
+    )
+
+
+def _memmap_members(path, mmap_mode):
+    """Return the arrays of a '.npz' file as memory maps (compressed ones are read)."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                # Compressed arrays can't be mapped, read them
+                with archive.open(info) as member:
+                    arrays[name] = np.load(member)
+                continue
+
+            # The data follows the local header with its own name and extra field
+            file.seek(info.header_offset)
+            header = file.read(_LOCAL_HEADER_SIZE)
+            name_size, extra_size = struct.unpack("<HH", header[26:30])
+            file.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_size + extra_size)
+
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+
+            if not np.prod(shape, dtype=np.int64):
+                # Empty arrays can't be mapped
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode=mmap_mode,
+                offset=file.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+
+    return arrays
+
+
+def load_arrays(path, kind, mmap_mode="r"):
+    """Load binned results saved by 'save_arrays'.
+
+    With 'mmap_mode' (see 'np.memmap') the arrays are memory-mapped instead
+    of read, i.e. loading takes the same time for any size. Like for
+    'save_arrays' the suffix '.npz' is appended to the path if missing.
+    Raise a ValueError if the file holds another kind or a newer schema
+    version.
+    """
+    path = _npz_path(path)
+    if mmap_mode is None:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    else:
+        arrays = _memmap_members(path, mmap_mode)
+
+    try:
+        stored_kind = str(arrays.pop("__kind__"))
+        version = int(arrays.pop("__version__"))
+    except KeyError:
+        raise ValueError(f"'{path}' holds no binned results!") from None
+    if stored_kind != kind:
+        raise ValueError(f"'{path}' holds a {stored_kind}, not a {kind}!")
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"'{path}' has schema version {version}, only up to {SCHEMA_VERSION} is supported!"
+        )
+
+    return arrays
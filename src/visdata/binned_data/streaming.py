@@ -0,0 +1,203 @@
+import operator
+
+import numpy as np
+
+from .binning import BinAxis
+from .histogram2d import (
+    Profile2dPlotConfig,
+    Profile2dPlotConfigMean,
+    Profile2dPlotConfigMedian,
+    add_profile2d_configs_to_axis,
+)
+from .segments import bin_moments, merge_moments, moments_statistics
+from .sharing import reduce_chunks
+from .sketch import QuantileSketch
+from .storage import save_arrays
+
+
+class Profile2dAccumulator:
+
+    def __init__(self, bin_edges, quantile_accuracy=None):
+        """Accumulate the profile for a 2d data problem chunk by chunk.
+
+        The x bins are fixed by 'bin_edges' (edges or BinAxis), data outside
+        is ignored. Only the
+        count, mean and sum of squared deviations (Welford-style) are kept
+        for each bin, i.e. the memory does not depend on the amount of data.
+        Medians and quantiles are estimated from a quantile sketch with the
+        relative accuracy 'quantile_accuracy' if given.
+        """
+        if isinstance(bin_edges, BinAxis):
+            self.__axis = bin_edges
+        else:
+            self.__axis = BinAxis(bin_edges)
+
+        n_bins = self.__axis.n_bins
+        self.__counts = np.zeros(n_bins, dtype=np.int64)
+        self.__means = np.zeros(n_bins)
+        self.__m2 = np.zeros(n_bins)
+
+        self.__quantile_accuracy = quantile_accuracy
+        if quantile_accuracy is None:
+            self.__sketch = None
+        else:
+            self.__sketch = QuantileSketch(n_bins, relative_accuracy=quantile_accuracy)
+
+    def fill(self, x, y, n_threads=1, chunk_size=2**20):
+        """Add a chunk of data to the profile.
+
+        Data larger than 'chunk_size' is split into chunks which are profiled
+        by 'n_threads' threads (None for all available CPUs). The partial
+        profiles are merged in chunk order as they arrive, i.e. the result
+        does not depend on the number of threads.
+        """
+        x = np.asarray(x)
+        y = np.asarray(y)
+        if x.shape != y.shape:
+            raise ValueError(f"Shapes of x {x.shape} and y {y.shape} do not match!")
+
+        if x.size > chunk_size:
+            def fill_chunk(start, stop):
+                profile = Profile2dAccumulator(self.__axis, self.__quantile_accuracy)
+                return profile.fill(x[start:stop], y[start:stop])
+
+            merged = self + reduce_chunks(
+                fill_chunk, operator.add, x.size, chunk_size, n_threads
+            )
+            self.__counts, self.__means, self.__m2 = (
+                merged.__counts,
+                merged.__means,
+                merged.__m2,
+            )
+            self.__sketch = merged.__sketch
+            return self
+
+        bin_ids = self.__axis.index(x)
+        moments = bin_moments(bin_ids, y, self.__axis.n_bins)
+        self.__counts, self.__means, self.__m2 = merge_moments(
+            (self.__counts, self.__means, self.__m2), moments
+        )
+        if self.__sketch is not None:
+            self.__sketch.add(bin_ids, y)
+
+        return self
+
+    def merge(self, other):
+        """Return a new accumulator combining this one and 'other'."""
+        if not isinstance(other, Profile2dAccumulator):
+            raise TypeError(
+                f"Can't merge {self.__class__.__name__} with {type(other).__name__}!"
+            )
+        if self.__axis != other.__axis:
+            raise ValueError("Can't merge profiles with different bin edges!")
+        if self.__quantile_accuracy != other.__quantile_accuracy:
+            raise ValueError("Can't merge profiles with different quantile accuracy!")
+
+        merged = Profile2dAccumulator(self.__axis, self.__quantile_accuracy)
+        merged.__counts, merged.__means, merged.__m2 = merge_moments(
+            (self.__counts, self.__means, self.__m2),
+            (other.__counts, other.__means, other.__m2),
+        )
+        if self.__sketch is not None:
+            merged.__sketch = self.__sketch + other.__sketch
+
+        return merged
+
+    def __add__(self, other):
+        if not isinstance(other, Profile2dAccumulator):
+            return NotImplemented
+
+        return self.merge(other)
+
+    @property
+    def bin_axis(self):
+        """Return the axis of the x bins."""
+        return self.__axis
+
+    @property
+    def bin_centers(self):
+        """Return the centers for the x bins."""
+        return self.__axis.centers
+
+    @property
+    def bin_edges(self):
+        """Return the edges for the x bins."""
+        return self.__axis.edges
+
+    @property
+    def bin_counts(self):
+        """Return the number of entries for each x bin."""
+        return self.__counts
+
+    @property
+    def bin_means(self):
+        """Return the means for each x bin."""
+        return moments_statistics(self.__counts, self.__means, self.__m2)[0]
+
+    @property
+    def bin_stds(self):
+        """Return the standard deviations for each x bin."""
+        return moments_statistics(self.__counts, self.__means, self.__m2)[1]
+
+    @property
+    def bin_sems(self):
+        """Return the standard error of the mean for each x bin."""
+        return moments_statistics(self.__counts, self.__means, self.__m2)[2]
+
+    @property
+    def bin_medians(self):
+        """Return the estimated medians for each x bin (None without sketch)."""
+        if self.__sketch is None:
+            return None
+
+        return self.__sketch.quantiles(0.5)
+
+    def bin_quantiles(self, q):
+        """Return the estimated quantiles 'q' for each x bin."""
+        if self.__sketch is None:
+            raise ValueError(
+                f"{self.__class__.__name__} keeps no quantile sketch, set 'quantile_accuracy'!"
+            )
+
+        return self.__sketch.quantiles(q)
+
+    def statistic(self, name, *args):
+        """Return the statistic 'name' for each x bin (None if not available)."""
+        match name:
+            case "mean":
+                return self.bin_means
+            case "median":
+                return self.bin_medians
+            case "std":
+                return self.bin_stds
+            case "sem":
+                return self.bin_sems
+            case "quantiles":
+                return None if self.__sketch is None else self.bin_quantiles(*args)
+            case _:
+                raise ValueError(f"Unknown quantity '{name}'!")
+
+    def save(self, path):
+        """Save the edges, counts and statistics as '.npz', see 'Profile2d.save'."""
+        arrays = {
+            "edges": self.bin_edges,
+            "counts": self.__counts,
+            "effective_counts": self.__counts,
+            "statistic_mean": self.bin_means,
+            "statistic_std": self.bin_stds,
+            "statistic_sem": self.bin_sems,
+        }
+        if self.__sketch is not None:
+            arrays["statistic_median"] = self.bin_medians
+
+        save_arrays(path, "Profile2d", **arrays)
+
+    def add_to_axis(self, ax, *configs: Profile2dPlotConfig):
+        """Add the profile to the given axis (without sketch only the mean)."""
+        if not len(configs):
+            if self.__sketch is None:
+                configs = (Profile2dPlotConfigMean(),)
+            else:
+                configs = (Profile2dPlotConfigMedian(), Profile2dPlotConfigMean())
+
+        add_profile2d_configs_to_axis(ax, self.bin_centers, self.statistic, *configs)